@@ -1,4 +1,4 @@
-from .indicators import StockAnalyzer, compare_stocks
+from .indicators import StockAnalyzer, compare_stocks, batch_summary_stats
 from .screener import StockScreener
 from .valuation import (
     analisar_valuation, 
@@ -10,7 +10,7 @@ from .valuation import (
 )
 
 __all__ = [
-    'StockAnalyzer', 'compare_stocks', 'StockScreener',
+    'StockAnalyzer', 'compare_stocks', 'batch_summary_stats', 'StockScreener',
     'analisar_valuation', 'graham_formula', 'graham_formula_original',
     'bazin_formula', 'gordon_ddm', 'ValuationResult'
 ]
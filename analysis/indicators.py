@@ -3,6 +3,8 @@ Módulo para cálculo de indicadores técnicos e análise de performance
 """
 import pandas as pd
 import numpy as np
+import warnings
+from functools import cached_property
 from typing import Optional
 
 
@@ -17,14 +19,31 @@ class StockAnalyzer:
             history: DataFrame com colunas OHLCV do yfinance
         """
         self.history = history.copy()
-        self._prepare_data()
     
-    def _prepare_data(self):
-        """Prepara os dados calculando retornos"""
-        if 'Close' in self.history.columns:
-            self.history['returns'] = self.history['Close'].pct_change()
-            self.history['log_returns'] = np.log(self.history['Close'] / self.history['Close'].shift(1))
-            self.history['cumulative_returns'] = (1 + self.history['returns']).cumprod() - 1
+    # Séries derivadas calculadas sob demanda e guardadas na instância: quem só pede o
+    # resumo estatístico (que trabalha direto nos arrays) não paga por elas
+    @cached_property
+    def returns(self) -> pd.Series:
+        """Retornos diários simples"""
+        return self.history['Close'].pct_change()
+    
+    @cached_property
+    def log_returns(self) -> pd.Series:
+        """Retornos diários logarítmicos"""
+        close = self.history['Close']
+        return np.log(close / close.shift(1))
+    
+    @cached_property
+    def cum_returns(self) -> pd.Series:
+        """Retorno acumulado desde o início do histórico"""
+        return (1 + self.returns).cumprod() - 1
+    
+    @cached_property
+    def drawdown(self) -> pd.Series:
+        """Drawdown em relação à máxima histórica"""
+        close = self.history['Close']
+        cummax = close.cummax()
+        return (close - cummax) / cummax
     
     def get_returns(self, period: Optional[int] = None) -> pd.Series:
         """
@@ -34,8 +53,8 @@ class StockAnalyzer:
             period: Número de dias (None para todos)
         """
         if period:
-            return self.history['returns'].tail(period)
-        return self.history['returns']
+            return self.returns.tail(period)
+        return self.returns
     
     def total_return(self, period: Optional[int] = None) -> float:
         """Calcula retorno total do período"""
@@ -64,7 +83,7 @@ class StockAnalyzer:
             period: Janela em dias
             annualized: Se True, anualiza a volatilidade
         """
-        returns = self.history['returns'].tail(period).dropna()
+        returns = self.returns.tail(period).dropna()
         vol = returns.std()
         if annualized:
             vol *= np.sqrt(252)
@@ -86,11 +105,10 @@ class StockAnalyzer:
     
     def max_drawdown(self, period: Optional[int] = None) -> float:
         """Calcula máximo drawdown"""
-        if period:
-            prices = self.history['Close'].tail(period)
-        else:
-            prices = self.history['Close']
+        if not period:
+            return self.drawdown.min()
         
+        prices = self.history['Close'].tail(period)
         cummax = prices.cummax()
         drawdown = (prices - cummax) / cummax
         return drawdown.min()
@@ -99,24 +117,87 @@ class StockAnalyzer:
         """Calcula média móvel simples"""
         return self.history['Close'].rolling(window=window).mean()
     
-    def add_moving_averages(self, windows: list = [20, 50, 200]):
+    def add_moving_averages(self, windows: tuple = (20, 50, 200)):
         """Adiciona múltiplas médias móveis ao DataFrame"""
         for w in windows:
             self.history[f'MA_{w}'] = self.moving_average(w)
     
     def get_summary_stats(self, period: int = 252) -> dict:
-        """Retorna resumo estatístico"""
-        return {
-            'retorno_total': self.total_return(period),
-            'retorno_anualizado': self.annualized_return(period),
-            'volatilidade_anual': self.volatility(period),
-            'sharpe_ratio': self.sharpe_ratio(period=period),
-            'max_drawdown': self.max_drawdown(period),
-            'preco_atual': self.history['Close'].iloc[-1],
-            'preco_max_52w': self.history['Close'].tail(252).max(),
-            'preco_min_52w': self.history['Close'].tail(252).min(),
-            'volume_medio': self.history['Volume'].tail(period).mean(),
-        }
+        """Retorna resumo estatístico (calculado numa passada sobre os arrays NumPy)"""
+        stats = _summary_stats_np(self.history['Close'].to_numpy(dtype=float),
+                                  self.history['Volume'].to_numpy(dtype=float), period)
+        return {key: float(value) for key, value in stats.items()}
+
+
+def _summary_stats_np(close: np.ndarray, volume: np.ndarray, period: int = 252,
+                      risk_free_rate: float = 0.1075) -> dict:
+    """
+    Núcleo de get_summary_stats sobre os arrays de fechamento e volume
+    
+    Equivalente a total_return, annualized_return, volatility, sharpe_ratio
+    e max_drawdown, sem criar Series intermediárias. Aceita arrays 1-D (uma
+    ação) ou 2-D (datas x tickers), calculando por coluna.
+    
+    Returns:
+        Dicionário com as mesmas chaves de get_summary_stats
+    """
+    # period falso (0/None) = histórico inteiro, como em total_return e max_drawdown
+    window = close[-(period + 1):] if period else close
+    total = window[-1] / window[0] - 1 if len(window) >= 2 else np.zeros(close.shape[1:])
+    days = period if period else len(close)
+    annualized = (1 + total) ** (252 / days) - 1 if days else np.zeros(close.shape[1:])
+    
+    returns = window[1:] / window[:-1] - 1
+    n_returns = np.sum(~np.isnan(returns), axis=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        vol = np.where(n_returns > 1, np.nanstd(returns, axis=0, ddof=1) * np.sqrt(252), np.nan)
+        sharpe = np.where(vol == 0, 0.0, (annualized - risk_free_rate) / vol)
+    
+    prices = close[-period:] if period else close
+    cummax = np.fmax.accumulate(prices, axis=0)
+    
+    return {
+        'retorno_total': total,
+        'retorno_anualizado': annualized,
+        'volatilidade_anual': vol,
+        'sharpe_ratio': sharpe,
+        'max_drawdown': np.nanmin((prices - cummax) / cummax, axis=0),
+        'preco_atual': close[-1],
+        'preco_max_52w': np.nanmax(close[-252:], axis=0),
+        'preco_min_52w': np.nanmin(close[-252:], axis=0),
+        'volume_medio': np.nanmean(volume[-period:] if period else volume, axis=0),
+    }
+
+
+def batch_summary_stats(histories: dict, period: int = 252) -> pd.DataFrame:
+    """
+    Resumo estatístico de várias ações de uma vez
+    
+    Se os históricos têm as mesmas datas, os fechamentos são empilhados numa
+    matriz (datas x tickers) e tudo sai de uma única chamada ao núcleo NumPy;
+    senão, o núcleo roda ticker a ticker.
+    
+    Args:
+        histories: Dicionário {ticker: DataFrame OHLCV}
+        period: Janela em dias
+    
+    Returns:
+        DataFrame indexado por ticker, com as colunas de get_summary_stats
+    """
+    index = pd.Index(list(histories), name='ticker')
+    frames = list(histories.values())
+    if not frames:
+        return pd.DataFrame(index=index)
+    
+    if all(h.index.equals(frames[0].index) for h in frames[1:]):
+        close = np.column_stack([h['Close'].to_numpy(dtype=float) for h in frames])
+        volume = np.column_stack([h['Volume'].to_numpy(dtype=float) for h in frames])
+        return pd.DataFrame(_summary_stats_np(close, volume, period), index=index)
+    
+    rows = [_summary_stats_np(h['Close'].to_numpy(dtype=float), h['Volume'].to_numpy(dtype=float), period)
+            for h in frames]
+    return pd.DataFrame([{key: float(value) for key, value in row.items()} for row in rows], index=index)
 
 
 def compare_stocks(analyzers: dict) -> pd.DataFrame:
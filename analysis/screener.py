@@ -2,6 +2,8 @@
 Módulo de Screener - Filtro de ações por critérios fundamentalistas
 """
 import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional, List, Dict, Any
 from data.fetcher import StockFetcher
 
@@ -48,29 +50,26 @@ class StockScreener:
         Args:
             verbose: Se True, mostra progresso
         """
-        records = []
+        snapshots = {}
         failed = []
         
-        for i, ticker in enumerate(self.tickers):
-            if verbose:
-                print(f"[{i+1}/{len(self.tickers)}] Buscando {ticker}...", end=" ")
-            
-            try:
-                stock = StockFetcher(ticker)
-                basic = stock.get_basic_info()
-                fundamentals = stock.get_fundamentals()
-                
-                record = {**basic, **fundamentals}
-                records.append(record)
-                
-                if verbose:
-                    print("OK")
-            except Exception as e:
-                failed.append(ticker)
-                if verbose:
-                    print(f"ERRO: {e}")
-        
-        self.data = pd.DataFrame(records)
+        # Busca em paralelo (I/O); o progresso é impresso conforme cada ticker termina
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(self.tickers)))) as executor:
+            futures = {executor.submit(_fetch_snapshot, ticker): ticker for ticker in self.tickers}
+            for i, future in enumerate(as_completed(futures)):
+                ticker = futures[future]
+                try:
+                    snapshots[ticker] = future.result()
+                    if verbose:
+                        print(f"[{i+1}/{len(self.tickers)}] {ticker} OK")
+                except Exception as e:
+                    failed.append(ticker)
+                    if verbose:
+                        print(f"[{i+1}/{len(self.tickers)}] {ticker} ERRO: {e}")
+        
+        # Mantém a ordem do universo
+        records = [snapshots[ticker] for ticker in self.tickers if ticker in snapshots]
+        self.data = _fill_derived_ratios(pd.DataFrame(records))
         
         if verbose and failed:
             print(f"\nFalha ao buscar: {', '.join(failed)}")
@@ -105,26 +104,28 @@ class StockScreener:
         if self.data is None:
             raise ValueError("Execute fetch_all_data() primeiro")
         
-        df = self.data.copy()
+        df = self.data
         
+        # Combina os critérios numa única máscara e indexa uma vez só
+        mask = pd.Series(True, index=df.index)
         if pl_max is not None:
-            df = df[df['pl'] <= pl_max]
+            mask &= df['pl'] <= pl_max
         if pl_min is not None:
-            df = df[df['pl'] >= pl_min]
+            mask &= df['pl'] >= pl_min
         if pvp_max is not None:
-            df = df[df['pvp'] <= pvp_max]
+            mask &= df['pvp'] <= pvp_max
         if pvp_min is not None:
-            df = df[df['pvp'] >= pvp_min]
+            mask &= df['pvp'] >= pvp_min
         if dy_min is not None:
-            df = df[df['dividend_yield'] >= dy_min]
+            mask &= df['dividend_yield'] >= dy_min
         if roe_min is not None:
-            df = df[df['roe'] >= roe_min]
+            mask &= df['roe'] >= roe_min
         if market_cap_min is not None:
-            df = df[df['market_cap'] >= market_cap_min]
+            mask &= df['market_cap'] >= market_cap_min
         if setor is not None:
-            df = df[df['setor'].str.contains(setor, case=False, na=False)]
+            mask &= df['setor'].str.contains(setor, case=False, na=False)
         
-        return df
+        return df[mask]
     
     def rank_by(self, column: str, ascending: bool = True, top_n: int = 10) -> pd.DataFrame:
         """
@@ -172,6 +173,28 @@ class StockScreener:
         return df.sort_values('roe', ascending=False).head(top_n)
 
 
+def _fetch_snapshot(ticker: str) -> dict:
+    """Busca o snapshot de um ticker (executado em paralelo)"""
+    return StockFetcher(ticker).get_snapshot(derive_ratios=False)
+
+
+def _fill_derived_ratios(df: pd.DataFrame) -> pd.DataFrame:
+    """Completa EV/EBITDA e PSR ausentes de todas as ações de uma vez"""
+    if df.empty:
+        return df
+    
+    def _col(name):
+        return pd.to_numeric(df[name], errors='coerce')
+    
+    for ratio, num, den in (('ev_ebitda', 'enterprise_value', 'ebitda'),
+                            ('psr', 'market_cap', 'receita_total')):
+        current = _col(ratio)
+        derived = _col(num).replace(0, np.nan) / _col(den).replace(0, np.nan)
+        df[ratio] = current.where(current.notna() & (current != 0), derived)
+    
+    return df
+
+
 if __name__ == "__main__":
     # Teste rápido com poucas ações
     screener = StockScreener(['ITUB4', 'BBDC4', 'PETR4', 'VALE3', 'WEGE3'])
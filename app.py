@@ -9,8 +9,11 @@ import numpy as np
 import yfinance as yf
 import plotly.graph_objects as go
 import plotly.express as px
+import plotly.io as pio
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import sys
 import os
 
@@ -33,6 +36,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Template padrão de todos os gráficos Plotly (aplicado uma vez, não a cada figura)
+pio.templates.default = 'plotly_white'
+
 # CSS customizado
 st.markdown("""
 <style>
@@ -52,6 +58,79 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+# ============================================================
+# CONSTANTES
+# ============================================================
+# Períodos disponíveis no seletor da sidebar
+PERIOD_OPTIONS = {
+    "1 mês": "1mo",
+    "3 meses": "3mo",
+    "6 meses": "6mo",
+    "1 ano": "1y",
+    "2 anos": "2y",
+    "5 anos": "5y"
+}
+
+# Padrão de ticker usado para extrair códigos dos campos de texto
+TICKER_RE = re.compile(r"[A-Z0-9.^=\-]+")
+
+# Médias móveis disponíveis e suas cores
+MA_OPTIONS = (20, 50, 100, 200)
+MA_DEFAULT = (20, 50)
+MA_COLORS = {20: '#e74c3c', 50: '#f39c12', 200: '#9b59b6'}
+
+# Universo padrão do screener
+SCREENER_DEFAULT_TICKERS = ('ITUB4', 'BBDC4', 'BBAS3', 'PETR4', 'VALE3', 'WEGE3', 
+                            'ABEV3', 'B3SA3', 'RENT3', 'EQTL3', 'SUZB3', 'JBSS3',
+                            'ELET3', 'PRIO3', 'RADL3', 'RAIL3', 'VIVT3', 'TOTS3')
+
+# Métricas da grade de barras da comparação: (coluna, título, escala de cores)
+COMPARISON_METRICS = (
+    ('pl', 'P/L', 'RdYlGn_r'),
+    ('roe', 'ROE (%)', 'RdYlGn'),
+    ('pvp', 'P/VP', 'RdYlGn_r'),
+    ('dy', 'Dividend Yield (%)', 'RdYlGn'),
+)
+
+# Sensibilidade de cada setor à taxa de juros
+SECTOR_RATE_SENSITIVITY = {
+    'Financial Services': ('Alta', 'Bancos se beneficiam de juros altos (spread)'),
+    'Banks': ('Alta', 'Spread bancário aumenta com SELIC alta'),
+    'Real Estate': ('Alta negativa', 'Juros altos encarecem financiamentos'),
+    'Utilities': ('Média', 'Receitas previsíveis, mas dívida sensível a juros'),
+    'Consumer Cyclical': ('Alta negativa', 'Consumo cai com crédito caro'),
+    'Technology': ('Média negativa', 'Valuations comprimem com juros altos'),
+    'Consumer Defensive': ('Baixa', 'Demanda inelástica'),
+    'Energy': ('Baixa', 'Commodities seguem ciclo próprio'),
+    'Basic Materials': ('Baixa', 'Mais ligado a ciclo global'),
+}
+
+# Faixas de margem de segurança (%, limite inferior) e o tipo de alerta de cada uma
+MARGIN_BANDS = ((30, 'success'), (15, 'success'), (-10, 'info'), (float('-inf'), 'warning'))
+
+# Mensagens de cada faixa, por método de valuation
+MARGIN_MESSAGES = {
+    'graham': (
+        "🟢 MUITO BARATO - Margem de segurança alta",
+        "🟢 BARATO - Boa margem de segurança",
+        "🟡 PREÇO JUSTO",
+        "🔴 CARO - Acima do preço justo",
+    ),
+    'bazin_normalizado': (
+        "🟢 MUITO BARATO para dividendos (normalizado)",
+        "🟢 BARATO para dividendos (normalizado)",
+        "🟡 PREÇO JUSTO para dividendos (normalizado)",
+        "🔴 DY abaixo de 6% no preço atual (normalizado)",
+    ),
+    'bazin': (
+        "🟢 MUITO BARATO para dividendos",
+        "🟢 BARATO para dividendos",
+        "🟡 PREÇO JUSTO para dividendos",
+        "🔴 DY abaixo de 6% no preço atual",
+    ),
+}
+
+
 # ============================================================
 # FUNÇÕES AUXILIARES
 # ============================================================
@@ -70,40 +149,71 @@ def fetch_stock_data(ticker: str, period: str = "1y"):
         raise e
 
 
+@st.cache_data(ttl=600)
+def compute_stats(ticker: str, period: str = "1y"):
+    """Calcula o resumo estatístico da ação com cache"""
+    _, _, history = fetch_stock_data(ticker, period)
+    return summary_stats(history)
+
+
+@st.cache_data(ttl=600)
+def summary_stats(history: pd.DataFrame):
+    """Resumo estatístico de um histórico já carregado (sem nova busca)"""
+    return StockAnalyzer(history).get_summary_stats()
+
+
 @st.cache_data(ttl=600)
 def fetch_multiple_stocks_data(tickers: list, period: str = "1y"):
-    """Busca dados de múltiplas ações com delay para evitar rate limit"""
-    import time
+    """Busca dados de múltiplas ações em paralelo"""
+    # Limita o número de workers para evitar rate limit do Yahoo Finance
+    max_workers = max(1, min(8, len(tickers)))
     data = {}
-    for i, ticker in enumerate(tickers):
-        try:
-            # Delay entre requisições para evitar rate limit
-            if i > 0:
-                time.sleep(0.5)
-            stock = StockFetcher(ticker)
-            data[ticker] = {
-                'basic': stock.get_basic_info(),
-                'fundamentals': stock.get_fundamentals(),
-                'history': stock.get_history(period=period)
-            }
-        except Exception as e:
-            if 'rate' in str(e).lower() or 'limit' in str(e).lower():
-                st.warning(f"Rate limit atingido. Aguarde um momento...")
-                time.sleep(5)
-                try:
-                    stock = StockFetcher(ticker)
-                    data[ticker] = {
-                        'basic': stock.get_basic_info(),
-                        'fundamentals': stock.get_fundamentals(),
-                        'history': stock.get_history(period=period)
-                    }
-                except:
-                    st.warning(f"Não foi possível buscar {ticker}")
-            else:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {ticker: executor.submit(fetch_stock_data, ticker, period) for ticker in tickers}
+        # Percorre na ordem original para manter a ordem dos tickers nos gráficos
+        for ticker, future in futures.items():
+            try:
+                basic, fundamentals, history = future.result()
+                data[ticker] = {
+                    'basic': basic,
+                    'fundamentals': fundamentals,
+                    'history': history
+                }
+            except Exception as e:
                 st.warning(f"Erro ao buscar {ticker}: {e}")
     return data
 
 
+@st.cache_data(ttl=600)
+def fetch_screener_row(ticker: str) -> dict:
+    """Busca a linha de uma ação para o screener com cache"""
+    snapshot = StockFetcher(ticker).get_snapshot()
+    return {
+        'ticker': ticker,
+        'nome': snapshot['nome'],
+        'setor': snapshot['setor'],
+        'preco': snapshot['preco_atual'],
+        'pl': snapshot['pl'],
+        'pvp': snapshot['pvp'],
+        'dy': snapshot['dividend_yield'],
+        'roe': snapshot['roe'],
+        'margem': snapshot['margem_liquida']
+    }
+
+
+def iter_screener_rows(tickers: list):
+    """Gera (ticker, linha) à medida que cada busca termina; a linha é None se a busca falhar"""
+    max_workers = max(1, min(8, len(tickers)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_screener_row, ticker): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            try:
+                row = future.result()
+            except Exception:
+                row = None
+            yield futures[future], row
+
+
 @st.cache_data(ttl=3600)  # Cache de 1 hora para dados macro
 def fetch_macro_data():
     """Busca indicadores macroeconômicos do BCB"""
@@ -114,6 +224,11 @@ def fetch_macro_data():
         return {'selic': 10.75, 'ipca_12m': 4.5, 'cdi': 10.65, 'cambio': 5.0, 'erro': str(e)}
 
 
+def normalize_ticker(widget_key: str, state_key: str):
+    """Callback do text_input: guarda o ticker normalizado (sem espaços, maiúsculo) no session_state"""
+    st.session_state[state_key] = st.session_state[widget_key].strip().upper()
+
+
 def format_number(value, prefix="", suffix="", decimals=2):
     """Formata número para exibição"""
     if value is None or (isinstance(value, float) and np.isnan(value)):
@@ -135,6 +250,42 @@ def format_percent(value):
     return f"{value * 100:.2f}%"
 
 
+def format_series(values: pd.Series, template: str = "{:.2f}", scale: float = 1) -> pd.Series:
+    """Formata uma coluna inteira de uma vez (vazios e zeros viram N/A)"""
+    values = pd.to_numeric(values, errors='coerce')
+    return values.mul(scale).map(template.format).where(values.notna() & (values != 0), "N/A")
+
+
+def top_k(df: pd.DataFrame, column: str, k: int = 5, largest: bool = True) -> pd.DataFrame:
+    """Retorna as k linhas com maiores (ou menores) valores da coluna via np.argpartition, sem ordenar tudo"""
+    values = df[column].to_numpy(dtype=float)
+    if largest:
+        values = -values
+    idx = np.argpartition(values, k)[:k] if k < len(values) else np.arange(len(values))
+    return df.iloc[idx[np.argsort(values[idx], kind='stable')]]
+
+
+def markdown_table(headers: tuple, rows) -> str:
+    """Monta uma tabela markdown a partir de um cabeçalho e linhas (tuplas)"""
+    lines = ["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows)
+    return "\n".join(lines)
+
+
+def margin_verdict(margem: float, metodo: str) -> tuple:
+    """
+    Classifica a margem de segurança (%) nas faixas de MARGIN_BANDS
+    
+    Returns:
+        Tupla (nível do alerta no Streamlit, mensagem)
+    """
+    for (limite, nivel), mensagem in zip(MARGIN_BANDS, MARGIN_MESSAGES[metodo]):
+        if margem >= limite:
+            return nivel, mensagem
+    # margem NaN não cai em nenhuma faixa: usa a última (alerta), como o antigo if/elif
+    return MARGIN_BANDS[-1][1], MARGIN_MESSAGES[metodo][-1]
+
+
 def get_color(value, threshold_good=0, threshold_bad=0, invert=False):
     """Retorna cor baseada no valor"""
     if value is None:
@@ -144,7 +295,138 @@ def get_color(value, threshold_good=0, threshold_bad=0, invert=False):
     return "positive" if value > threshold_good else "negative" if value < threshold_bad else "neutral"
 
 
-def create_price_chart(history: pd.DataFrame, ticker: str, show_ma: list = [20, 50]):
+@st.cache_data(ttl=600)
+def format_view_model(basic: dict, fund: dict, stats: dict, currency: str = "R$") -> dict:
+    """Pré-formata os valores exibidos na análise individual com cache"""
+    prefix = f"{currency} "
+    return {
+        # Informações básicas
+        'preco_atual': f"{prefix}{basic['preco_atual']:.2f}",
+        'market_cap': format_number(basic['market_cap'], prefix=prefix),
+        # Múltiplos
+        'pl': f"{fund['pl']:.2f}" if fund['pl'] else "N/A",
+        'pvp': f"{fund['pvp']:.2f}" if fund['pvp'] else "N/A",
+        'ev_ebitda': f"{fund['ev_ebitda']:.2f}" if fund.get('ev_ebitda') else "N/A",
+        'psr': f"{fund['psr']:.2f}" if fund.get('psr') else "N/A",
+        # Rentabilidade
+        'roe': format_percent(fund['roe']),
+        'roa': format_percent(fund.get('roa')),
+        'margem_liquida': format_percent(fund['margem_liquida']),
+        'margem_bruta': format_percent(fund.get('margem_bruta')),
+        'dividend_yield': format_percent(fund['dividend_yield']),
+        'payout_ratio': format_percent(fund['payout_ratio']),
+        # Dados financeiros
+        'lpa': f"{prefix}{fund['lpa']:.2f}" if fund['lpa'] else "N/A",
+        'vpa': f"{prefix}{fund['vpa']:.2f}" if fund['vpa'] else "N/A",
+        'receita_total': format_number(fund['receita_total'], prefix=prefix),
+        'lucro_liquido': format_number(fund['lucro_liquido'], prefix=prefix),
+        'ebitda': format_number(fund.get('ebitda'), prefix=prefix),
+        'enterprise_value': format_number(fund.get('enterprise_value'), prefix=prefix),
+        'divida_patrimonio': f"{fund['divida_patrimonio']:.2f}" if fund.get('divida_patrimonio') else "N/A",
+        # Performance
+        'retorno_periodo': f"{stats['retorno_total']*100:.1f}%",
+        'retorno_total': format_percent(stats['retorno_total']),
+        'retorno_anualizado': format_percent(stats['retorno_anualizado']),
+        'volatilidade_anual': format_percent(stats['volatilidade_anual']),
+        'sharpe_ratio': f"{stats['sharpe_ratio']:.2f}",
+        'max_drawdown': format_percent(stats['max_drawdown']),
+        'preco_max_52w': f"{prefix}{stats['preco_max_52w']:.2f}",
+        'preco_min_52w': f"{prefix}{stats['preco_min_52w']:.2f}",
+        'volume_medio': format_number(stats['volume_medio']),
+    }
+
+
+@st.cache_data(ttl=600)
+def build_interpretations(fund: dict, stats: dict, benchmark: dict, selic: float):
+    """
+    Gera a interpretação automática da ação com cache
+    
+    Returns:
+        Lista de tuplas (emoji, título, descrição)
+    """
+    interpretations = []
+    
+    # P/L comparado com setor
+    if fund['pl'] and fund['pl'] > 0:
+        pl_vs_setor = fund['pl'] / benchmark['pl_medio']
+        if pl_vs_setor < 0.7:
+            interpretations.append(("✅", "P/L abaixo do setor", 
+                f"P/L de {fund['pl']:.1f} está {(1-pl_vs_setor)*100:.0f}% abaixo da média do setor ({benchmark['pl_medio']})"))
+        elif pl_vs_setor > 1.5:
+            interpretations.append(("⚠️", "P/L acima do setor", 
+                f"P/L de {fund['pl']:.1f} está {(pl_vs_setor-1)*100:.0f}% acima da média do setor ({benchmark['pl_medio']})"))
+        else:
+            interpretations.append(("➖", "P/L alinhado ao setor", 
+                f"P/L de {fund['pl']:.1f} próximo à média do setor ({benchmark['pl_medio']})"))
+    elif fund['pl'] and fund['pl'] < 0:
+        interpretations.append(("🔴", "P/L negativo", "Empresa com prejuízo no período"))
+    
+    # P/VP comparado com setor
+    if fund['pvp'] and fund['pvp'] > 0:
+        pvp_vs_setor = fund['pvp'] / benchmark['pvp_medio']
+        if pvp_vs_setor < 0.7:
+            interpretations.append(("✅", "P/VP abaixo do setor", 
+                f"P/VP de {fund['pvp']:.2f} sugere desconto patrimonial"))
+        elif pvp_vs_setor > 1.5:
+            interpretations.append(("⚠️", "P/VP acima do setor", 
+                f"P/VP de {fund['pvp']:.2f} pode indicar sobrevalorização"))
+    
+    # ROE
+    if fund['roe']:
+        if fund['roe'] > 0.20:
+            interpretations.append(("✅", "ROE excelente (>20%)", "Alta rentabilidade sobre patrimônio"))
+        elif fund['roe'] > 0.15:
+            interpretations.append(("✅", "ROE bom (>15%)", "Boa rentabilidade sobre patrimônio"))
+        elif fund['roe'] < 0.08:
+            interpretations.append(("⚠️", "ROE baixo (<8%)", "Baixa rentabilidade"))
+    
+    # DY comparado com setor
+    if fund['dividend_yield']:
+        dy_vs_setor = fund['dividend_yield'] / benchmark['dy_medio'] if benchmark['dy_medio'] > 0 else 1
+        if dy_vs_setor > 1.5:
+            interpretations.append(("✅", "DY acima do setor", 
+                f"Dividend Yield de {fund['dividend_yield']*100:.2f}% acima da média setorial"))
+        if fund['dividend_yield'] > 0.08:
+            interpretations.append(("✅", "DY muito alto (>8%)", "Excelente pagadora de dividendos"))
+    
+    # Performance vs CDI
+    if stats['retorno_anualizado'] > selic/100:
+        interpretations.append(("✅", "Bateu o CDI", 
+            f"Retorno de {stats['retorno_anualizado']*100:.1f}% superou a SELIC ({selic:.1f}%)"))
+    elif stats['retorno_total'] < -0.20:
+        interpretations.append(("⚠️", "Queda significativa", 
+            f"Ação caiu {abs(stats['retorno_total'])*100:.1f}% no período"))
+    
+    # Sharpe
+    if stats['sharpe_ratio'] > 1.5:
+        interpretations.append(("✅", "Sharpe excelente (>1.5)", "Ótimo retorno ajustado ao risco"))
+    elif stats['sharpe_ratio'] > 1:
+        interpretations.append(("✅", "Sharpe bom (>1)", "Bom retorno ajustado ao risco"))
+    elif stats['sharpe_ratio'] < 0:
+        interpretations.append(("⚠️", "Sharpe negativo", "Retorno inferior ao CDI"))
+    
+    # Volatilidade
+    if stats['volatilidade_anual'] > 0.50:
+        interpretations.append(("⚠️", "Alta volatilidade (>50%)", "Ação com alto risco"))
+    elif stats['volatilidade_anual'] < 0.25:
+        interpretations.append(("✅", "Baixa volatilidade (<25%)", "Ação defensiva"))
+    
+    return interpretations
+
+
+def _history_fingerprint(history: pd.DataFrame):
+    """Hash leve do histórico para o cache de figuras (tamanho, última data e último preço)"""
+    if history.empty:
+        return (0, None, None)
+    return (len(history), history.index[-1].value, float(history['Close'].iloc[-1]))
+
+
+# Figuras Plotly ficam em cache_resource (mesmo objeto a cada rerun), chaveadas pelo hash leve do histórico
+FIGURE_CACHE = dict(hash_funcs={pd.DataFrame: _history_fingerprint}, max_entries=64)
+
+
+@st.cache_resource(**FIGURE_CACHE)
+def create_price_chart(history: pd.DataFrame, ticker: str, show_ma: tuple = MA_DEFAULT):
     """Cria gráfico de preço interativo com Plotly"""
     fig = make_subplots(
         rows=2, cols=1,
@@ -168,7 +450,6 @@ def create_price_chart(history: pd.DataFrame, ticker: str, show_ma: list = [20,
     )
     
     # Médias móveis
-    colors = {20: '#e74c3c', 50: '#f39c12', 200: '#9b59b6'}
     for period in show_ma:
         ma = history['Close'].rolling(period).mean()
         fig.add_trace(
@@ -177,7 +458,7 @@ def create_price_chart(history: pd.DataFrame, ticker: str, show_ma: list = [20,
                 y=ma,
                 mode='lines',
                 name=f'MM{period}',
-                line=dict(color=colors.get(period, '#1f77b4'), width=1)
+                line=dict(color=MA_COLORS.get(period, '#1f77b4'), width=1)
             ),
             row=1, col=1
         )
@@ -199,13 +480,13 @@ def create_price_chart(history: pd.DataFrame, ticker: str, show_ma: list = [20,
     fig.update_layout(
         height=600,
         xaxis_rangeslider_visible=False,
-        template='plotly_white',
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
     )
     
     return fig
 
 
+@st.cache_resource(**FIGURE_CACHE)
 def create_returns_chart(history: pd.DataFrame, ticker: str):
     """Cria gráfico de retornos acumulados"""
     returns = history['Close'].pct_change()
@@ -227,13 +508,62 @@ def create_returns_chart(history: pd.DataFrame, ticker: str):
     fig.update_layout(
         title=f'{ticker} - Retorno Acumulado',
         yaxis_title='Retorno (%)',
-        template='plotly_white',
         height=400
     )
     
     return fig
 
 
+@st.cache_resource(**FIGURE_CACHE)
+def create_drawdown_chart(history: pd.DataFrame, ticker: str):
+    """Cria gráfico de drawdown"""
+    close = history['Close'].to_numpy()
+    cummax = np.fmax.accumulate(close)
+    drawdown = (close - cummax) / cummax * 100
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=history.index,
+        y=drawdown,
+        fill='tozeroy',
+        fillcolor='rgba(231, 76, 60, 0.3)',
+        line=dict(color='#e74c3c'),
+        name='Drawdown'
+    ))
+    fig.update_layout(
+        title=f'{ticker} - Drawdown',
+        yaxis_title='Drawdown (%)',
+        height=400
+    )
+    
+    return fig
+
+
+@st.cache_resource(**FIGURE_CACHE)
+def create_returns_histogram(history: pd.DataFrame, ticker: str):
+    """Cria histograma de retornos diários (o ticker entra na chave do cache)"""
+    close = history['Close'].to_numpy()
+    returns = np.diff(close) / close[:-1] * 100
+    returns = returns[np.isfinite(returns)]
+    
+    # Bins calculados direto no NumPy (evita a inferência de colunas do Plotly Express)
+    counts, edges = np.histogram(returns, bins=50)
+    centers = (edges[:-1] + edges[1:]) / 2
+    
+    fig = go.Figure(go.Bar(x=centers, y=counts, width=np.diff(edges)))
+    fig.add_vline(x=returns.mean(), line_dash="dash", line_color="red",
+                  annotation_text=f"Média: {returns.mean():.2f}%")
+    fig.update_layout(
+        title="Distribuição de Retornos Diários",
+        xaxis_title='Retorno (%)',
+        yaxis_title='Frequência',
+        showlegend=False,
+        bargap=0
+    )
+    
+    return fig
+
+
 def create_comparison_chart(histories: dict, normalize: bool = True):
     """Cria gráfico comparativo de múltiplas ações"""
     fig = go.Figure()
@@ -257,7 +587,6 @@ def create_comparison_chart(histories: dict, normalize: bool = True):
     fig.update_layout(
         title=title,
         yaxis_title='Base 100' if normalize else 'Preço (R$)',
-        template='plotly_white',
         height=500,
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
     )
@@ -265,6 +594,23 @@ def create_comparison_chart(histories: dict, normalize: bool = True):
     return fig
 
 
+def create_metrics_grid(data: pd.DataFrame, metrics: tuple = COMPARISON_METRICS):
+    """Cria grade 2x2 de barras comparando as métricas entre as ações"""
+    fig = make_subplots(rows=2, cols=2, subplot_titles=[title for _, title, _ in metrics])
+    
+    for i, (metric, _, scale) in enumerate(metrics):
+        fig.add_trace(go.Bar(
+            x=data['ticker'],
+            y=data[metric],
+            marker=dict(color=data[metric], colorscale=scale),
+            showlegend=False
+        ), row=i // 2 + 1, col=i % 2 + 1)
+    
+    fig.update_layout(height=800)
+    
+    return fig
+
+
 def create_fundamentals_chart(data: pd.DataFrame, metric: str, title: str):
     """Cria gráfico de barras para comparação de fundamentos"""
     fig = go.Figure()
@@ -281,7 +627,6 @@ def create_fundamentals_chart(data: pd.DataFrame, metric: str, title: str):
     
     fig.update_layout(
         title=title,
-        template='plotly_white',
         height=400
     )
     
@@ -305,20 +650,12 @@ with st.sidebar:
     st.markdown("---")
     
     # Período
-    period_options = {
-        "1 mês": "1mo",
-        "3 meses": "3mo",
-        "6 meses": "6mo",
-        "1 ano": "1y",
-        "2 anos": "2y",
-        "5 anos": "5y"
-    }
     selected_period = st.selectbox(
         "Período de análise",
-        options=list(period_options.keys()),
+        options=list(PERIOD_OPTIONS.keys()),
         index=3  # Default: 1 ano
     )
-    period = period_options[selected_period]
+    period = PERIOD_OPTIONS[selected_period]
     
     st.markdown("---")
     st.markdown("**Ações populares:**")
@@ -379,7 +716,11 @@ if page == "🏠 Home":
     
     # Quick stats de mercado
     st.markdown("### 🚀 Análise Rápida")
-    quick_ticker = st.text_input("Digite um ticker para análise rápida:", value="ITUB4").upper()
+    st.session_state.setdefault("quick_ticker", "ITUB4")
+    st.text_input("Digite um ticker para análise rápida:", value=st.session_state["quick_ticker"],
+                  key="quick_ticker_input", on_change=normalize_ticker,
+                  args=("quick_ticker_input", "quick_ticker"))
+    quick_ticker = st.session_state["quick_ticker"]
     
     if st.button("Analisar", type="primary"):
         with st.spinner(f"Buscando dados de {quick_ticker}..."):
@@ -402,18 +743,32 @@ if page == "🏠 Home":
 elif page == "📊 Análise Individual":
     st.title("📊 Análise Individual")
     
-    ticker = st.text_input("Digite o ticker:", value="ITUB4").upper()
+    st.session_state.setdefault("ticker", "ITUB4")
+    st.text_input("Digite o ticker:", value=st.session_state["ticker"],
+                  key="ticker_input", on_change=normalize_ticker,
+                  args=("ticker_input", "ticker"))
+    ticker = st.session_state["ticker"]
+    
+    # Só roda a análise após o clique; reruns de outros widgets reutilizam o ticker analisado
+    if st.button("Analisar", type="primary"):
+        st.session_state["analyzed_ticker"] = ticker
     
-    if st.button("Analisar", type="primary") or ticker:
+    if ticker and st.session_state.get("analyzed_ticker") == ticker:
         with st.spinner(f"Carregando dados de {ticker}..."):
             try:
                 basic, fund, history = fetch_stock_data(ticker, period)
-                analyzer = StockAnalyzer(history)
-                stats = analyzer.get_summary_stats()
+                stats = compute_stats(ticker, period)
+                formatted = format_view_model(basic, fund, stats)
+                
+                # Valores usados em várias seções
+                preco_atual = basic['preco_atual']
+                setor = basic['setor']
+                lpa, vpa = fund['lpa'], fund['vpa']
+                dy = fund['dividend_yield'] or 0
                 
                 # Header com info básica
                 st.markdown(f"## {basic['nome']}")
-                st.markdown(f"**Setor:** {basic['setor']} | **Indústria:** {basic['industria']}")
+                st.markdown(f"**Setor:** {setor} | **Indústria:** {basic['industria']}")
                 
                 st.markdown("---")
                 
@@ -422,31 +777,35 @@ elif page == "📊 Análise Individual":
                 
                 col1.metric(
                     "Preço Atual",
-                    f"R$ {basic['preco_atual']:.2f}",
-                    f"{stats['retorno_total']*100:.1f}% ({selected_period})"
+                    formatted['preco_atual'],
+                    f"{formatted['retorno_periodo']} ({selected_period})"
                 )
-                col2.metric("Market Cap", format_number(basic['market_cap'], prefix="R$ "))
-                col3.metric("P/L", f"{fund['pl']:.2f}" if fund['pl'] else "N/A")
-                col4.metric("P/VP", f"{fund['pvp']:.2f}" if fund['pvp'] else "N/A")
-                col5.metric("Dividend Yield", format_percent(fund['dividend_yield']))
+                col2.metric("Market Cap", formatted['market_cap'])
+                col3.metric("P/L", formatted['pl'])
+                col4.metric("P/VP", formatted['pvp'])
+                col5.metric("Dividend Yield", formatted['dividend_yield'])
                 
                 st.markdown("---")
                 
                 # Busca dados macro para contexto
                 macro_data = fetch_macro_data()
                 
-                # Tabs
-                tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-                    "📈 Gráficos", "📋 Fundamentos", "📊 Performance", 
-                    "💰 Valuation", "🌍 Contexto Macro", "💡 Interpretação"
-                ])
+                # Seções - só a seção selecionada é montada (st.tabs renderiza todas a cada rerun)
+                section = st.radio(
+                    "Seção",
+                    ["📈 Gráficos", "📋 Fundamentos", "📊 Performance", 
+                     "💰 Valuation", "🌍 Contexto Macro", "💡 Interpretação"],
+                    horizontal=True,
+                    key="active_section",
+                    label_visibility="collapsed"
+                )
                 
-                with tab1:
+                if section == "📈 Gráficos":
                     # Seletor de médias móveis
                     ma_options = st.multiselect(
                         "Médias Móveis:",
-                        [20, 50, 100, 200],
-                        default=[20, 50]
+                        MA_OPTIONS,
+                        default=MA_DEFAULT
                     )
                     
                     st.plotly_chart(
@@ -459,119 +818,78 @@ elif page == "📊 Análise Individual":
                         st.plotly_chart(create_returns_chart(history, ticker), use_container_width=True)
                     
                     with col2:
-                        # Drawdown chart
-                        cummax = history['Close'].cummax()
-                        drawdown = (history['Close'] - cummax) / cummax * 100
-                        
-                        fig_dd = go.Figure()
-                        fig_dd.add_trace(go.Scatter(
-                            x=history.index,
-                            y=drawdown,
-                            fill='tozeroy',
-                            fillcolor='rgba(231, 76, 60, 0.3)',
-                            line=dict(color='#e74c3c'),
-                            name='Drawdown'
-                        ))
-                        fig_dd.update_layout(
-                            title=f'{ticker} - Drawdown',
-                            yaxis_title='Drawdown (%)',
-                            template='plotly_white',
-                            height=400
-                        )
-                        st.plotly_chart(fig_dd, use_container_width=True)
+                        st.plotly_chart(create_drawdown_chart(history, ticker), use_container_width=True)
                 
-                with tab2:
+                elif section == "📋 Fundamentos":
                     col1, col2 = st.columns(2)
                     
                     with col1:
                         st.markdown("### Múltiplos de Valuation")
-                        fund_data = {
-                            "Indicador": ["P/L", "P/VP", "EV/EBITDA", "PSR"],
-                            "Valor": [
-                                f"{fund['pl']:.2f}" if fund['pl'] else "N/A",
-                                f"{fund['pvp']:.2f}" if fund['pvp'] else "N/A",
-                                f"{fund['ev_ebitda']:.2f}" if fund.get('ev_ebitda') else "N/A",
-                                f"{fund['psr']:.2f}" if fund.get('psr') else "N/A"
-                            ]
-                        }
-                        st.table(pd.DataFrame(fund_data))
+                        fund_data = (
+                            ("P/L", formatted['pl']),
+                            ("P/VP", formatted['pvp']),
+                            ("EV/EBITDA", formatted['ev_ebitda']),
+                            ("PSR", formatted['psr']),
+                        )
+                        st.markdown(markdown_table(("Indicador", "Valor"), fund_data))
                     
                     with col2:
                         st.markdown("### Rentabilidade")
-                        rent_data = {
-                            "Indicador": ["ROE", "ROA", "Margem Líquida", "Margem Bruta", "Dividend Yield", "Payout"],
-                            "Valor": [
-                                format_percent(fund['roe']),
-                                format_percent(fund.get('roa')),
-                                format_percent(fund['margem_liquida']),
-                                format_percent(fund.get('margem_bruta')),
-                                format_percent(fund['dividend_yield']),
-                                format_percent(fund['payout_ratio'])
-                            ]
-                        }
-                        st.table(pd.DataFrame(rent_data))
+                        rent_data = (
+                            ("ROE", formatted['roe']),
+                            ("ROA", formatted['roa']),
+                            ("Margem Líquida", formatted['margem_liquida']),
+                            ("Margem Bruta", formatted['margem_bruta']),
+                            ("Dividend Yield", formatted['dividend_yield']),
+                            ("Payout", formatted['payout_ratio']),
+                        )
+                        st.markdown(markdown_table(("Indicador", "Valor"), rent_data))
                     
                     st.markdown("### Dados Financeiros")
                     col1, col2 = st.columns(2)
                     with col1:
-                        fin_data = {
-                            "Item": ["LPA", "VPA", "Receita Total", "Lucro Líquido"],
-                            "Valor": [
-                                f"R$ {fund['lpa']:.2f}" if fund['lpa'] else "N/A",
-                                f"R$ {fund['vpa']:.2f}" if fund['vpa'] else "N/A",
-                                format_number(fund['receita_total'], prefix="R$ "),
-                                format_number(fund['lucro_liquido'], prefix="R$ ")
-                            ]
-                        }
-                        st.table(pd.DataFrame(fin_data))
+                        fin_data = (
+                            ("LPA", formatted['lpa']),
+                            ("VPA", formatted['vpa']),
+                            ("Receita Total", formatted['receita_total']),
+                            ("Lucro Líquido", formatted['lucro_liquido']),
+                        )
+                        st.markdown(markdown_table(("Item", "Valor"), fin_data))
                     with col2:
-                        fin_data2 = {
-                            "Item": ["EBITDA", "Enterprise Value", "Dívida/Patrimônio"],
-                            "Valor": [
-                                format_number(fund.get('ebitda'), prefix="R$ "),
-                                format_number(fund.get('enterprise_value'), prefix="R$ "),
-                                f"{fund['divida_patrimonio']:.2f}" if fund.get('divida_patrimonio') else "N/A"
-                            ]
-                        }
-                        st.table(pd.DataFrame(fin_data2))
+                        fin_data2 = (
+                            ("EBITDA", formatted['ebitda']),
+                            ("Enterprise Value", formatted['enterprise_value']),
+                            ("Dívida/Patrimônio", formatted['divida_patrimonio']),
+                        )
+                        st.markdown(markdown_table(("Item", "Valor"), fin_data2))
                 
-                with tab3:
+                elif section == "📊 Performance":
                     col1, col2, col3, col4 = st.columns(4)
                     
-                    col1.metric("Retorno Total", format_percent(stats['retorno_total']))
-                    col2.metric("Retorno Anualizado", format_percent(stats['retorno_anualizado']))
-                    col3.metric("Volatilidade", format_percent(stats['volatilidade_anual']))
-                    col4.metric("Sharpe Ratio", f"{stats['sharpe_ratio']:.2f}")
+                    col1.metric("Retorno Total", formatted['retorno_total'])
+                    col2.metric("Retorno Anualizado", formatted['retorno_anualizado'])
+                    col3.metric("Volatilidade", formatted['volatilidade_anual'])
+                    col4.metric("Sharpe Ratio", formatted['sharpe_ratio'])
                     
                     col1, col2, col3, col4 = st.columns(4)
-                    col1.metric("Max Drawdown", format_percent(stats['max_drawdown']))
-                    col2.metric("Máx 52 sem", f"R$ {stats['preco_max_52w']:.2f}")
-                    col3.metric("Mín 52 sem", f"R$ {stats['preco_min_52w']:.2f}")
-                    col4.metric("Vol. Médio", format_number(stats['volume_medio']))
+                    col1.metric("Max Drawdown", formatted['max_drawdown'])
+                    col2.metric("Máx 52 sem", formatted['preco_max_52w'])
+                    col3.metric("Mín 52 sem", formatted['preco_min_52w'])
+                    col4.metric("Vol. Médio", formatted['volume_medio'])
                     
                     # Distribuição de retornos
-                    returns = history['Close'].pct_change().dropna() * 100
-                    fig_hist = px.histogram(
-                        returns,
-                        nbins=50,
-                        title="Distribuição de Retornos Diários",
-                        labels={'value': 'Retorno (%)', 'count': 'Frequência'}
-                    )
-                    fig_hist.add_vline(x=returns.mean(), line_dash="dash", line_color="red",
-                                       annotation_text=f"Média: {returns.mean():.2f}%")
-                    fig_hist.update_layout(template='plotly_white', showlegend=False)
-                    st.plotly_chart(fig_hist, use_container_width=True)
+                    st.plotly_chart(create_returns_histogram(history, ticker), use_container_width=True)
                 
-                with tab4:
+                elif section == "💰 Valuation":
                     st.markdown("### 💰 Valuation - Preço Justo")
                     
                     # Busca benchmark do setor para DY normalizado
-                    benchmark = get_sector_benchmark(basic['setor'])
+                    benchmark = get_sector_benchmark(setor)
                     
                     # Calcula DPA (Dividendo por Ação) se tiver DY e preço
                     dpa = 0
-                    if fund['dividend_yield'] and basic['preco_atual']:
-                        dpa = fund['dividend_yield'] * basic['preco_atual']
+                    if dy and preco_atual:
+                        dpa = dy * preco_atual
                     
                     selic = macro_data.get('selic', 10.75) or 10.75
                     
@@ -586,9 +904,9 @@ elif page == "📊 Análise Individual":
                         para encontrar ações com margem de segurança.
                         """)
                         
-                        pj_graham = graham_formula_original(fund['lpa'], fund['vpa'])
+                        pj_graham = graham_formula_original(lpa, vpa)
                         if pj_graham:
-                            margem = (pj_graham - basic['preco_atual']) / pj_graham * 100
+                            margem = (pj_graham - preco_atual) / pj_graham * 100
                             
                             st.metric(
                                 "Preço Justo (Graham)",
@@ -596,14 +914,8 @@ elif page == "📊 Análise Individual":
                                 f"{margem:.1f}% {'desconto' if margem > 0 else 'prêmio'}"
                             )
                             
-                            if margem >= 30:
-                                st.success("🟢 MUITO BARATO - Margem de segurança alta")
-                            elif margem >= 15:
-                                st.success("🟢 BARATO - Boa margem de segurança")
-                            elif margem >= -10:
-                                st.info("🟡 PREÇO JUSTO")
-                            else:
-                                st.warning("🔴 CARO - Acima do preço justo")
+                            nivel, mensagem = margin_verdict(margem, 'graham')
+                            getattr(st, nivel)(mensagem)
                         else:
                             st.warning("Dados insuficientes (LPA ou VPA negativo/indisponível)")
                     
@@ -617,12 +929,11 @@ elif page == "📊 Análise Individual":
                         """)
                         
                         # Verifica se DY está anormalmente alto (dividendo extraordinário)
-                        dy_atual = fund['dividend_yield'] or 0
-                        dy_extraordinario = dy_atual > 0.15  # DY > 15% é suspeito
+                        dy_extraordinario = dy > 0.15  # DY > 15% é suspeito
                         
-                        if dy_extraordinario and dy_atual > 0:
+                        if dy_extraordinario and dy > 0:
                             st.warning(f"""
-                            ⚠️ **DY de {dy_atual*100:.1f}% parece extraordinário!**
+                            ⚠️ **DY de {dy*100:.1f}% parece extraordinário!**
                             
                             Provavelmente inclui dividendos especiais (JCP extra, distribuição de reservas).
                             Bazin assume dividendos **recorrentes e sustentáveis**.
@@ -633,13 +944,13 @@ elif page == "📊 Análise Individual":
                             
                             # Sugere DY normalizado baseado no setor
                             dy_normalizado = benchmark.get('dy_medio', 0.06)
-                            dpa_normalizado = dy_normalizado * basic['preco_atual']
+                            dpa_normalizado = dy_normalizado * preco_atual
                             pj_bazin_normalizado = bazin_formula(dpa_normalizado)
                             
                             st.markdown(f"**Usando DY normalizado do setor ({dy_normalizado*100:.0f}%):**")
                             
                             if pj_bazin_normalizado:
-                                margem = (pj_bazin_normalizado - basic['preco_atual']) / pj_bazin_normalizado * 100
+                                margem = (pj_bazin_normalizado - preco_atual) / pj_bazin_normalizado * 100
                                 
                                 st.metric(
                                     "Preço Justo (Bazin Normalizado)",
@@ -647,14 +958,8 @@ elif page == "📊 Análise Individual":
                                     f"{margem:.1f}% {'desconto' if margem > 0 else 'prêmio'}"
                                 )
                                 
-                                if margem >= 30:
-                                    st.success("🟢 MUITO BARATO para dividendos (normalizado)")
-                                elif margem >= 15:
-                                    st.success("🟢 BARATO para dividendos (normalizado)")
-                                elif margem >= -10:
-                                    st.info("🟡 PREÇO JUSTO para dividendos (normalizado)")
-                                else:
-                                    st.warning("🔴 DY abaixo de 6% no preço atual (normalizado)")
+                                nivel, mensagem = margin_verdict(margem, 'bazin_normalizado')
+                                getattr(st, nivel)(mensagem)
                             
                             # Mostra o valor distorcido para referência
                             with st.expander("Ver cálculo com DY atual (distorcido)"):
@@ -665,7 +970,7 @@ elif page == "📊 Análise Individual":
                             # DY normal - usa cálculo padrão
                             pj_bazin = bazin_formula(dpa)
                             if pj_bazin:
-                                margem = (pj_bazin - basic['preco_atual']) / pj_bazin * 100
+                                margem = (pj_bazin - preco_atual) / pj_bazin * 100
                                 
                                 st.metric(
                                     "Preço Justo (Bazin)",
@@ -673,35 +978,26 @@ elif page == "📊 Análise Individual":
                                     f"{margem:.1f}% {'desconto' if margem > 0 else 'prêmio'}"
                                 )
                                 
-                                if margem >= 30:
-                                    st.success("🟢 MUITO BARATO para dividendos")
-                                elif margem >= 15:
-                                    st.success("🟢 BARATO para dividendos")
-                                elif margem >= -10:
-                                    st.info("🟡 PREÇO JUSTO para dividendos")
-                                else:
-                                    st.warning("🔴 DY abaixo de 6% no preço atual")
+                                nivel, mensagem = margin_verdict(margem, 'bazin')
+                                getattr(st, nivel)(mensagem)
                             else:
                                 st.warning("Empresa não paga dividendos ou dados indisponíveis")
                     
                     # Resumo
                     st.markdown("---")
                     st.markdown("#### 📊 Dados utilizados no cálculo")
-                    calc_data = {
-                        "Variável": ["LPA", "VPA", "DPA (estimado)", "Preço Atual", "SELIC"],
-                        "Valor": [
-                            f"R$ {fund['lpa']:.2f}" if fund['lpa'] else "N/A",
-                            f"R$ {fund['vpa']:.2f}" if fund['vpa'] else "N/A",
-                            f"R$ {dpa:.2f}" if dpa else "N/A",
-                            f"R$ {basic['preco_atual']:.2f}",
-                            f"{selic:.2f}%"
-                        ]
-                    }
-                    st.table(pd.DataFrame(calc_data))
+                    calc_data = (
+                        ("LPA", formatted['lpa']),
+                        ("VPA", formatted['vpa']),
+                        ("DPA (estimado)", f"R$ {dpa:.2f}" if dpa else "N/A"),
+                        ("Preço Atual", formatted['preco_atual']),
+                        ("SELIC", f"{selic:.2f}%"),
+                    )
+                    st.markdown(markdown_table(("Variável", "Valor"), calc_data))
                     
                     st.caption("⚠️ Estes modelos são simplificados. Use como referência, não como recomendação de investimento.")
                 
-                with tab5:
+                elif section == "🌍 Contexto Macro":
                     st.markdown("### 🌍 Contexto Macroeconômico")
                     
                     col1, col2, col3, col4 = st.columns(4)
@@ -756,31 +1052,16 @@ elif page == "📊 Análise Individual":
                     st.markdown("---")
                     st.markdown("#### 🏦 Sensibilidade Setorial")
                     
-                    setor = basic['setor']
-                    
-                    sensibilidade_juros = {
-                        'Financial Services': ('Alta', 'Bancos se beneficiam de juros altos (spread)'),
-                        'Banks': ('Alta', 'Spread bancário aumenta com SELIC alta'),
-                        'Real Estate': ('Alta negativa', 'Juros altos encarecem financiamentos'),
-                        'Utilities': ('Média', 'Receitas previsíveis, mas dívida sensível a juros'),
-                        'Consumer Cyclical': ('Alta negativa', 'Consumo cai com crédito caro'),
-                        'Technology': ('Média negativa', 'Valuations comprimem com juros altos'),
-                        'Consumer Defensive': ('Baixa', 'Demanda inelástica'),
-                        'Energy': ('Baixa', 'Commodities seguem ciclo próprio'),
-                        'Basic Materials': ('Baixa', 'Mais ligado a ciclo global'),
-                    }
-                    
-                    if setor in sensibilidade_juros:
-                        sens, explicacao = sensibilidade_juros[setor]
+                    if setor in SECTOR_RATE_SENSITIVITY:
+                        sens, explicacao = SECTOR_RATE_SENSITIVITY[setor]
                         st.info(f"**{setor}** — Sensibilidade a juros: **{sens}**\n\n{explicacao}")
                     else:
                         st.info(f"Setor: {setor}")
                 
-                with tab6:
+                elif section == "💡 Interpretação":
                     st.markdown("### 💡 Interpretação Automática")
                     
                     # Busca benchmark do setor
-                    setor = basic['setor']
                     benchmark = get_sector_benchmark(setor)
                     
                     st.markdown(f"**Setor:** {setor}")
@@ -788,73 +1069,8 @@ elif page == "📊 Análise Individual":
                     
                     st.markdown("---")
                     
-                    interpretations = []
-                    
-                    # P/L comparado com setor
-                    if fund['pl'] and fund['pl'] > 0:
-                        pl_vs_setor = fund['pl'] / benchmark['pl_medio']
-                        if pl_vs_setor < 0.7:
-                            interpretations.append(("✅", "P/L abaixo do setor", 
-                                f"P/L de {fund['pl']:.1f} está {(1-pl_vs_setor)*100:.0f}% abaixo da média do setor ({benchmark['pl_medio']})"))
-                        elif pl_vs_setor > 1.5:
-                            interpretations.append(("⚠️", "P/L acima do setor", 
-                                f"P/L de {fund['pl']:.1f} está {(pl_vs_setor-1)*100:.0f}% acima da média do setor ({benchmark['pl_medio']})"))
-                        else:
-                            interpretations.append(("➖", "P/L alinhado ao setor", 
-                                f"P/L de {fund['pl']:.1f} próximo à média do setor ({benchmark['pl_medio']})"))
-                    elif fund['pl'] and fund['pl'] < 0:
-                        interpretations.append(("🔴", "P/L negativo", "Empresa com prejuízo no período"))
-                    
-                    # P/VP comparado com setor
-                    if fund['pvp'] and fund['pvp'] > 0:
-                        pvp_vs_setor = fund['pvp'] / benchmark['pvp_medio']
-                        if pvp_vs_setor < 0.7:
-                            interpretations.append(("✅", "P/VP abaixo do setor", 
-                                f"P/VP de {fund['pvp']:.2f} sugere desconto patrimonial"))
-                        elif pvp_vs_setor > 1.5:
-                            interpretations.append(("⚠️", "P/VP acima do setor", 
-                                f"P/VP de {fund['pvp']:.2f} pode indicar sobrevalorização"))
-                    
-                    # ROE
-                    if fund['roe']:
-                        if fund['roe'] > 0.20:
-                            interpretations.append(("✅", "ROE excelente (>20%)", "Alta rentabilidade sobre patrimônio"))
-                        elif fund['roe'] > 0.15:
-                            interpretations.append(("✅", "ROE bom (>15%)", "Boa rentabilidade sobre patrimônio"))
-                        elif fund['roe'] < 0.08:
-                            interpretations.append(("⚠️", "ROE baixo (<8%)", "Baixa rentabilidade"))
-                    
-                    # DY comparado com setor
-                    if fund['dividend_yield']:
-                        dy_vs_setor = fund['dividend_yield'] / benchmark['dy_medio'] if benchmark['dy_medio'] > 0 else 1
-                        if dy_vs_setor > 1.5:
-                            interpretations.append(("✅", "DY acima do setor", 
-                                f"Dividend Yield de {fund['dividend_yield']*100:.2f}% acima da média setorial"))
-                        if fund['dividend_yield'] > 0.08:
-                            interpretations.append(("✅", "DY muito alto (>8%)", "Excelente pagadora de dividendos"))
-                    
-                    # Performance vs CDI
                     selic = macro_data.get('selic', 10.75) or 10.75
-                    if stats['retorno_anualizado'] > selic/100:
-                        interpretations.append(("✅", "Bateu o CDI", 
-                            f"Retorno de {stats['retorno_anualizado']*100:.1f}% superou a SELIC ({selic:.1f}%)"))
-                    elif stats['retorno_total'] < -0.20:
-                        interpretations.append(("⚠️", "Queda significativa", 
-                            f"Ação caiu {abs(stats['retorno_total'])*100:.1f}% no período"))
-                    
-                    # Sharpe
-                    if stats['sharpe_ratio'] > 1.5:
-                        interpretations.append(("✅", "Sharpe excelente (>1.5)", "Ótimo retorno ajustado ao risco"))
-                    elif stats['sharpe_ratio'] > 1:
-                        interpretations.append(("✅", "Sharpe bom (>1)", "Bom retorno ajustado ao risco"))
-                    elif stats['sharpe_ratio'] < 0:
-                        interpretations.append(("⚠️", "Sharpe negativo", "Retorno inferior ao CDI"))
-                    
-                    # Volatilidade
-                    if stats['volatilidade_anual'] > 0.50:
-                        interpretations.append(("⚠️", "Alta volatilidade (>50%)", "Ação com alto risco"))
-                    elif stats['volatilidade_anual'] < 0.25:
-                        interpretations.append(("✅", "Baixa volatilidade (<25%)", "Ação defensiva"))
+                    interpretations = build_interpretations(fund, stats, benchmark, selic)
                     
                     for emoji, title, desc in interpretations:
                         st.markdown(f"{emoji} **{title}** — {desc}")
@@ -876,7 +1092,7 @@ elif page == "⚖️ Comparar Ações":
         "Digite os tickers separados por vírgula:",
         value="ITUB4, BBDC4, BBAS3, SANB11"
     )
-    tickers = [t.strip().upper() for t in tickers_input.split(',') if t.strip()]
+    tickers = list(dict.fromkeys(TICKER_RE.findall(tickers_input.upper())))
     
     if len(tickers) < 2:
         st.warning("Digite pelo menos 2 tickers para comparar.")
@@ -899,71 +1115,49 @@ elif page == "⚖️ Comparar Ações":
                         # Tabela comparativa de fundamentos
                         st.markdown("### 📋 Comparação de Fundamentos")
                         
-                        comp_data = []
+                        # Extrai os campos numa única passada, coluna a coluna
+                        cols = {'ticker': [], 'preco': [], 'pl': [], 'pvp': [], 'dy': [], 'roe': [],
+                                'retorno': [], 'volatilidade': [], 'sharpe': []}
                         for ticker, d in data.items():
                             fund = d['fundamentals']
-                            basic = d['basic']
-                            analyzer = StockAnalyzer(d['history'])
-                            stats = analyzer.get_summary_stats()
-                            
-                            comp_data.append({
-                                'Ticker': ticker,
-                                'Preço': f"R$ {basic['preco_atual']:.2f}",
-                                'P/L': f"{fund['pl']:.2f}" if fund['pl'] else "N/A",
-                                'P/VP': f"{fund['pvp']:.2f}" if fund['pvp'] else "N/A",
-                                'DY': format_percent(fund['dividend_yield']),
-                                'ROE': format_percent(fund['roe']),
-                                'Retorno': format_percent(stats['retorno_total']),
-                                'Volatilidade': format_percent(stats['volatilidade_anual']),
-                                'Sharpe': f"{stats['sharpe_ratio']:.2f}"
-                            })
+                            # Estatísticas do histórico já carregado; falha num ticker não derruba a tabela
+                            try:
+                                stats = summary_stats(d['history'])
+                            except Exception as e:
+                                st.warning(f"Não foi possível calcular as estatísticas de {ticker}: {e}")
+                                stats = {}
+                            cols['ticker'].append(ticker)
+                            cols['preco'].append(d['basic']['preco_atual'])
+                            cols['pl'].append(fund['pl'])
+                            cols['pvp'].append(fund['pvp'])
+                            cols['dy'].append(fund['dividend_yield'])
+                            cols['roe'].append(fund['roe'])
+                            cols['retorno'].append(stats.get('retorno_total'))
+                            cols['volatilidade'].append(stats.get('volatilidade_anual'))
+                            cols['sharpe'].append(stats.get('sharpe_ratio'))
+                        raw = pd.DataFrame(cols)
                         
-                        df_comp = pd.DataFrame(comp_data)
+                        df_comp = pd.DataFrame({
+                            'Ticker': raw['ticker'],
+                            'Preço': format_series(raw['preco'], "R$ {:.2f}"),
+                            'P/L': format_series(raw['pl']),
+                            'P/VP': format_series(raw['pvp']),
+                            'DY': format_series(raw['dy'], "{:.2f}%", scale=100),
+                            'ROE': format_series(raw['roe'], "{:.2f}%", scale=100),
+                            'Retorno': format_series(raw['retorno'], "{:.2f}%", scale=100),
+                            'Volatilidade': format_series(raw['volatilidade'], "{:.2f}%", scale=100),
+                            'Sharpe': format_series(raw['sharpe'])
+                        })
                         st.dataframe(df_comp, use_container_width=True, hide_index=True)
                         
                         # Gráficos de barras comparativos
                         st.markdown("### 📊 Comparação Visual")
                         
-                        metrics_data = []
-                        for ticker, d in data.items():
-                            fund = d['fundamentals']
-                            metrics_data.append({
-                                'ticker': ticker,
-                                'pl': fund['pl'] if fund['pl'] else 0,
-                                'pvp': fund['pvp'] if fund['pvp'] else 0,
-                                'dy': (fund['dividend_yield'] or 0) * 100,
-                                'roe': (fund['roe'] or 0) * 100
-                            })
-                        
-                        df_metrics = pd.DataFrame(metrics_data)
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            fig_pl = px.bar(df_metrics, x='ticker', y='pl', title='P/L',
-                                           color='pl', color_continuous_scale='RdYlGn_r')
-                            fig_pl.update_layout(template='plotly_white', showlegend=False)
-                            st.plotly_chart(fig_pl, use_container_width=True)
+                        values = raw[['pl', 'pvp', 'dy', 'roe']].apply(pd.to_numeric, errors='coerce').fillna(0)
+                        df_metrics = raw[['ticker']].assign(pl=values['pl'], pvp=values['pvp'],
+                                                            dy=values['dy'] * 100, roe=values['roe'] * 100)
                         
-                        with col2:
-                            fig_roe = px.bar(df_metrics, x='ticker', y='roe', title='ROE (%)',
-                                            color='roe', color_continuous_scale='RdYlGn')
-                            fig_roe.update_layout(template='plotly_white', showlegend=False)
-                            st.plotly_chart(fig_roe, use_container_width=True)
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            fig_pvp = px.bar(df_metrics, x='ticker', y='pvp', title='P/VP',
-                                            color='pvp', color_continuous_scale='RdYlGn_r')
-                            fig_pvp.update_layout(template='plotly_white', showlegend=False)
-                            st.plotly_chart(fig_pvp, use_container_width=True)
-                        
-                        with col2:
-                            fig_dy = px.bar(df_metrics, x='ticker', y='dy', title='Dividend Yield (%)',
-                                           color='dy', color_continuous_scale='RdYlGn')
-                            fig_dy.update_layout(template='plotly_white', showlegend=False)
-                            st.plotly_chart(fig_dy, use_container_width=True)
+                        st.plotly_chart(create_metrics_grid(df_metrics), use_container_width=True)
                         
                 except Exception as e:
                     st.error(f"Erro: {e}")
@@ -977,16 +1171,12 @@ elif page == "🔍 Screener":
     st.markdown("Filtre ações da B3 por critérios fundamentalistas.")
     
     # Lista de ações para screening
-    default_tickers = ['ITUB4', 'BBDC4', 'BBAS3', 'PETR4', 'VALE3', 'WEGE3', 
-                       'ABEV3', 'B3SA3', 'RENT3', 'EQTL3', 'SUZB3', 'JBSS3',
-                       'ELET3', 'PRIO3', 'RADL3', 'RAIL3', 'VIVT3', 'TOTS3']
-    
     with st.expander("⚙️ Configurar universo de ações"):
         tickers_input = st.text_area(
             "Tickers (um por linha ou separados por vírgula):",
-            value=", ".join(default_tickers)
+            value=", ".join(SCREENER_DEFAULT_TICKERS)
         )
-        tickers = [t.strip().upper() for t in tickers_input.replace('\n', ',').split(',') if t.strip()]
+        tickers = list(dict.fromkeys(TICKER_RE.findall(tickers_input.upper())))
     
     st.markdown("### 🎯 Filtros")
     
@@ -1007,53 +1197,45 @@ elif page == "🔍 Screener":
     if st.button("🔍 Executar Screener", type="primary"):
         with st.spinner(f"Analisando {len(tickers)} ações..."):
             try:
-                # Busca dados
+                # Busca em paralelo; o progresso avança conforme cada ação termina
                 progress_bar = st.progress(0)
-                results = []
+                # Mostra as ações já carregadas enquanto as demais chegam
+                preview = st.empty()
+                rows = {}
+                for done, (ticker, row) in enumerate(iter_screener_rows(tickers), start=1):
+                    if row is not None:
+                        rows[ticker] = row
+                        preview.dataframe(pd.DataFrame(list(rows.values())), use_container_width=True, hide_index=True)
+                    progress_bar.progress(done / len(tickers))
+                preview.empty()
                 
-                for i, ticker in enumerate(tickers):
-                    try:
-                        stock = StockFetcher(ticker)
-                        basic = stock.get_basic_info()
-                        fund = stock.get_fundamentals()
-                        
-                        results.append({
-                            'ticker': ticker,
-                            'nome': basic['nome'],
-                            'setor': basic['setor'],
-                            'preco': basic['preco_atual'],
-                            'pl': fund['pl'],
-                            'pvp': fund['pvp'],
-                            'dy': fund['dividend_yield'],
-                            'roe': fund['roe'],
-                            'margem': fund['margem_liquida']
-                        })
-                    except:
-                        pass
-                    
-                    progress_bar.progress((i + 1) / len(tickers))
+                # Mantém a ordem original dos tickers
+                results = [rows[ticker] for ticker in tickers if ticker in rows]
                 
                 df = pd.DataFrame(results)
                 
-                # Aplica filtros
-                if use_pl and not df.empty:
-                    df = df[(df['pl'] >= pl_range[0]) & (df['pl'] <= pl_range[1]) & (df['pl'] > 0)]
-                if use_dy and not df.empty:
-                    df = df[df['dy'] >= dy_min / 100]
-                if use_roe and not df.empty:
-                    df = df[df['roe'] >= roe_min / 100]
+                # Aplica filtros numa única máscara
+                if not df.empty:
+                    mask = pd.Series(True, index=df.index)
+                    if use_pl:
+                        mask &= df['pl'].between(*pl_range) & (df['pl'] > 0)
+                    if use_dy:
+                        mask &= df['dy'] >= dy_min / 100
+                    if use_roe:
+                        mask &= df['roe'] >= roe_min / 100
+                    df = df[mask]
                 
                 st.success(f"Encontradas {len(df)} ações que atendem aos critérios.")
                 
                 if not df.empty:
                     # Formata para exibição
                     df_display = df.copy()
-                    df_display['preco'] = df_display['preco'].apply(lambda x: f"R$ {x:.2f}" if x else "N/A")
-                    df_display['pl'] = df_display['pl'].apply(lambda x: f"{x:.2f}" if x else "N/A")
-                    df_display['pvp'] = df_display['pvp'].apply(lambda x: f"{x:.2f}" if x else "N/A")
-                    df_display['dy'] = df_display['dy'].apply(lambda x: f"{x*100:.2f}%" if x else "N/A")
-                    df_display['roe'] = df_display['roe'].apply(lambda x: f"{x*100:.2f}%" if x else "N/A")
-                    df_display['margem'] = df_display['margem'].apply(lambda x: f"{x*100:.2f}%" if x else "N/A")
+                    df_display['preco'] = format_series(df_display['preco'], "R$ {:.2f}")
+                    df_display['pl'] = format_series(df_display['pl'])
+                    df_display['pvp'] = format_series(df_display['pvp'])
+                    df_display['dy'] = format_series(df_display['dy'], "{:.2f}%", scale=100)
+                    df_display['roe'] = format_series(df_display['roe'], "{:.2f}%", scale=100)
+                    df_display['margem'] = format_series(df_display['margem'], "{:.2f}%", scale=100)
                     
                     df_display.columns = ['Ticker', 'Nome', 'Setor', 'Preço', 'P/L', 'P/VP', 'DY', 'ROE', 'Margem Líq']
                     
@@ -1067,19 +1249,19 @@ elif page == "🔍 Screener":
                     
                     with col1:
                         st.markdown("**💰 Menor P/L (Value)**")
-                        value = df[df['pl'] > 0].nsmallest(5, 'pl')[['ticker', 'pl']]
+                        value = top_k(df[df['pl'] > 0], 'pl', largest=False)[['ticker', 'pl']]
                         value['pl'] = value['pl'].apply(lambda x: f"{x:.2f}")
                         st.dataframe(value, hide_index=True)
                     
                     with col2:
                         st.markdown("**💵 Maior DY (Dividendos)**")
-                        div = df[df['dy'] > 0].nlargest(5, 'dy')[['ticker', 'dy']]
+                        div = top_k(df[df['dy'] > 0], 'dy')[['ticker', 'dy']]
                         div['dy'] = div['dy'].apply(lambda x: f"{x*100:.2f}%")
                         st.dataframe(div, hide_index=True)
                     
                     with col3:
                         st.markdown("**⭐ Maior ROE (Qualidade)**")
-                        qual = df[df['roe'] > 0].nlargest(5, 'roe')[['ticker', 'roe']]
+                        qual = top_k(df[df['roe'] > 0], 'roe')[['ticker', 'roe']]
                         qual['roe'] = qual['roe'].apply(lambda x: f"{x*100:.2f}%")
                         st.dataframe(qual, hide_index=True)
                 
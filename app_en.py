@@ -9,8 +9,11 @@ import numpy as np
 import yfinance as yf
 import plotly.graph_objects as go
 import plotly.express as px
+import plotly.io as pio
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import sys
 import os
 
@@ -33,6 +36,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Default template for every Plotly chart (set once instead of per figure)
+pio.templates.default = 'plotly_white'
+
 # Custom CSS
 st.markdown("""
 <style>
@@ -52,6 +58,79 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+# ============================================================
+# CONSTANTS
+# ============================================================
+# Periods available in the sidebar selector
+PERIOD_OPTIONS = {
+    "1 month": "1mo",
+    "3 months": "3mo",
+    "6 months": "6mo",
+    "1 year": "1y",
+    "2 years": "2y",
+    "5 years": "5y"
+}
+
+# Ticker pattern used to extract symbols from text inputs
+TICKER_RE = re.compile(r"[A-Z0-9.^=\-]+")
+
+# Available moving averages and their colors
+MA_OPTIONS = (20, 50, 100, 200)
+MA_DEFAULT = (20, 50)
+MA_COLORS = {20: '#e74c3c', 50: '#f39c12', 200: '#9b59b6'}
+
+# Default screener universe
+SCREENER_DEFAULT_TICKERS = ('AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'NVDA', 
+                            'TSLA', 'JPM', 'V', 'JNJ', 'WMT', 'PG',
+                            'UNH', 'HD', 'BAC', 'XOM', 'PFE', 'KO')
+
+# Metrics in the comparison bar grid: (column, title, color scale)
+COMPARISON_METRICS = (
+    ('pl', 'P/E Ratio', 'RdYlGn_r'),
+    ('roe', 'ROE (%)', 'RdYlGn'),
+    ('pvp', 'P/B Ratio', 'RdYlGn_r'),
+    ('dy', 'Dividend Yield (%)', 'RdYlGn'),
+)
+
+# Interest rate sensitivity by sector
+SECTOR_RATE_SENSITIVITY = {
+    'Financial Services': ('High', 'Banks benefit from high rates (spread)'),
+    'Banks': ('High', 'Banking spread increases with high rates'),
+    'Real Estate': ('High negative', 'High rates make financing expensive'),
+    'Utilities': ('Medium', 'Predictable revenue, but debt sensitive to rates'),
+    'Consumer Cyclical': ('High negative', 'Consumption drops with expensive credit'),
+    'Technology': ('Medium negative', 'Valuations compress with high rates'),
+    'Consumer Defensive': ('Low', 'Inelastic demand'),
+    'Energy': ('Low', 'Commodities follow their own cycle'),
+    'Basic Materials': ('Low', 'More tied to global cycle'),
+}
+
+# Margin of safety bands (%, lower bound) and the alert type for each one
+MARGIN_BANDS = ((30, 'success'), (15, 'success'), (-10, 'info'), (float('-inf'), 'warning'))
+
+# Messages for each band, per valuation method
+MARGIN_MESSAGES = {
+    'graham': (
+        "🟢 VERY CHEAP - High margin of safety",
+        "🟢 CHEAP - Good margin of safety",
+        "🟡 FAIR PRICE",
+        "🔴 EXPENSIVE - Above fair price",
+    ),
+    'bazin_normalizado': (
+        "🟢 VERY CHEAP for dividends (normalized)",
+        "🟢 CHEAP for dividends (normalized)",
+        "🟡 FAIR PRICE for dividends (normalized)",
+        "🔴 DY below 6% at current price (normalized)",
+    ),
+    'bazin': (
+        "🟢 VERY CHEAP for dividends",
+        "🟢 CHEAP for dividends",
+        "🟡 FAIR PRICE for dividends",
+        "🔴 DY below 6% at current price",
+    ),
+}
+
+
 # ============================================================
 # HELPER FUNCTIONS
 # ============================================================
@@ -70,39 +149,71 @@ def fetch_stock_data(ticker: str, period: str = "1y"):
         raise e
 
 
+@st.cache_data(ttl=600)
+def compute_stats(ticker: str, period: str = "1y"):
+    """Compute the stock's summary statistics with cache"""
+    _, _, history = fetch_stock_data(ticker, period)
+    return summary_stats(history)
+
+
+@st.cache_data(ttl=600)
+def summary_stats(history: pd.DataFrame):
+    """Summary statistics of an already loaded history (no new fetch)"""
+    return StockAnalyzer(history).get_summary_stats()
+
+
 @st.cache_data(ttl=600)
 def fetch_multiple_stocks_data(tickers: list, period: str = "1y"):
-    """Fetch data for multiple stocks with delay to avoid rate limit"""
-    import time
+    """Fetch data for multiple stocks in parallel"""
+    # Cap the number of workers to avoid Yahoo Finance rate limits
+    max_workers = max(1, min(8, len(tickers)))
     data = {}
-    for i, ticker in enumerate(tickers):
-        try:
-            if i > 0:
-                time.sleep(0.5)
-            stock = StockFetcher(ticker)
-            data[ticker] = {
-                'basic': stock.get_basic_info(),
-                'fundamentals': stock.get_fundamentals(),
-                'history': stock.get_history(period=period)
-            }
-        except Exception as e:
-            if 'rate' in str(e).lower() or 'limit' in str(e).lower():
-                st.warning(f"Rate limit reached. Please wait...")
-                time.sleep(5)
-                try:
-                    stock = StockFetcher(ticker)
-                    data[ticker] = {
-                        'basic': stock.get_basic_info(),
-                        'fundamentals': stock.get_fundamentals(),
-                        'history': stock.get_history(period=period)
-                    }
-                except:
-                    st.warning(f"Could not fetch {ticker}")
-            else:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {ticker: executor.submit(fetch_stock_data, ticker, period) for ticker in tickers}
+        # Iterate in input order so charts keep the tickers' order
+        for ticker, future in futures.items():
+            try:
+                basic, fundamentals, history = future.result()
+                data[ticker] = {
+                    'basic': basic,
+                    'fundamentals': fundamentals,
+                    'history': history
+                }
+            except Exception as e:
                 st.warning(f"Error fetching {ticker}: {e}")
     return data
 
 
+@st.cache_data(ttl=600)
+def fetch_screener_row(ticker: str) -> dict:
+    """Fetch one stock's row for the screener with cache"""
+    snapshot = StockFetcher(ticker).get_snapshot()
+    return {
+        'ticker': ticker,
+        'name': snapshot['nome'],
+        'sector': snapshot['setor'],
+        'price': snapshot['preco_atual'],
+        'pl': snapshot['pl'],
+        'pvp': snapshot['pvp'],
+        'dy': snapshot['dividend_yield'],
+        'roe': snapshot['roe'],
+        'margin': snapshot['margem_liquida']
+    }
+
+
+def iter_screener_rows(tickers: list):
+    """Yield (ticker, row) as each fetch completes; row is None when the fetch fails"""
+    max_workers = max(1, min(8, len(tickers)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_screener_row, ticker): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            try:
+                row = future.result()
+            except Exception:
+                row = None
+            yield futures[future], row
+
+
 @st.cache_data(ttl=3600)  # 1 hour cache for macro data
 def fetch_macro_data():
     """Fetch macroeconomic indicators from BCB"""
@@ -113,6 +224,11 @@ def fetch_macro_data():
         return {'selic': 10.75, 'ipca_12m': 4.5, 'cdi': 10.65, 'cambio': 5.0, 'error': str(e)}
 
 
+def normalize_ticker(widget_key: str, state_key: str):
+    """text_input callback: store the normalized ticker (stripped, upper case) in session_state"""
+    st.session_state[state_key] = st.session_state[widget_key].strip().upper()
+
+
 def format_number(value, prefix="", suffix="", decimals=2):
     """Format number for display"""
     if value is None or (isinstance(value, float) and np.isnan(value)):
@@ -134,6 +250,42 @@ def format_percent(value):
     return f"{value * 100:.2f}%"
 
 
+def format_series(values: pd.Series, template: str = "{:.2f}", scale: float = 1) -> pd.Series:
+    """Format a whole column at once (missing values and zeros become N/A)"""
+    values = pd.to_numeric(values, errors='coerce')
+    return values.mul(scale).map(template.format).where(values.notna() & (values != 0), "N/A")
+
+
+def top_k(df: pd.DataFrame, column: str, k: int = 5, largest: bool = True) -> pd.DataFrame:
+    """Return the k rows with the largest (or smallest) values in the column via np.argpartition, without a full sort"""
+    values = df[column].to_numpy(dtype=float)
+    if largest:
+        values = -values
+    idx = np.argpartition(values, k)[:k] if k < len(values) else np.arange(len(values))
+    return df.iloc[idx[np.argsort(values[idx], kind='stable')]]
+
+
+def markdown_table(headers: tuple, rows) -> str:
+    """Build a markdown table from a header and row tuples"""
+    lines = ["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows)
+    return "\n".join(lines)
+
+
+def margin_verdict(margem: float, metodo: str) -> tuple:
+    """
+    Classify the margin of safety (%) into the MARGIN_BANDS ranges
+    
+    Returns:
+        Tuple (Streamlit alert level, message)
+    """
+    for (limite, nivel), mensagem in zip(MARGIN_BANDS, MARGIN_MESSAGES[metodo]):
+        if margem >= limite:
+            return nivel, mensagem
+    # A NaN margin matches no band: fall back to the last one (warning), like the old if/elif
+    return MARGIN_BANDS[-1][1], MARGIN_MESSAGES[metodo][-1]
+
+
 def get_color(value, threshold_good=0, threshold_bad=0, invert=False):
     """Return color based on value"""
     if value is None:
@@ -143,7 +295,138 @@ def get_color(value, threshold_good=0, threshold_bad=0, invert=False):
     return "positive" if value > threshold_good else "negative" if value < threshold_bad else "neutral"
 
 
-def create_price_chart(history: pd.DataFrame, ticker: str, show_ma: list = [20, 50]):
+@st.cache_data(ttl=600)
+def format_view_model(basic: dict, fund: dict, stats: dict, currency: str = "R$") -> dict:
+    """Pre-format the values displayed on the single stock page with cache"""
+    prefix = f"{currency} "
+    return {
+        # Basic info
+        'preco_atual': f"{prefix}{basic['preco_atual']:.2f}",
+        'market_cap': format_number(basic['market_cap'], prefix=prefix),
+        # Multiples
+        'pl': f"{fund['pl']:.2f}" if fund['pl'] else "N/A",
+        'pvp': f"{fund['pvp']:.2f}" if fund['pvp'] else "N/A",
+        'ev_ebitda': f"{fund['ev_ebitda']:.2f}" if fund.get('ev_ebitda') else "N/A",
+        'psr': f"{fund['psr']:.2f}" if fund.get('psr') else "N/A",
+        # Profitability
+        'roe': format_percent(fund['roe']),
+        'roa': format_percent(fund.get('roa')),
+        'margem_liquida': format_percent(fund['margem_liquida']),
+        'margem_bruta': format_percent(fund.get('margem_bruta')),
+        'dividend_yield': format_percent(fund['dividend_yield']),
+        'payout_ratio': format_percent(fund['payout_ratio']),
+        # Financial data
+        'lpa': f"{prefix}{fund['lpa']:.2f}" if fund['lpa'] else "N/A",
+        'vpa': f"{prefix}{fund['vpa']:.2f}" if fund['vpa'] else "N/A",
+        'receita_total': format_number(fund['receita_total'], prefix=prefix),
+        'lucro_liquido': format_number(fund['lucro_liquido'], prefix=prefix),
+        'ebitda': format_number(fund.get('ebitda'), prefix=prefix),
+        'enterprise_value': format_number(fund.get('enterprise_value'), prefix=prefix),
+        'divida_patrimonio': f"{fund['divida_patrimonio']:.2f}" if fund.get('divida_patrimonio') else "N/A",
+        # Performance
+        'retorno_periodo': f"{stats['retorno_total']*100:.1f}%",
+        'retorno_total': format_percent(stats['retorno_total']),
+        'retorno_anualizado': format_percent(stats['retorno_anualizado']),
+        'volatilidade_anual': format_percent(stats['volatilidade_anual']),
+        'sharpe_ratio': f"{stats['sharpe_ratio']:.2f}",
+        'max_drawdown': format_percent(stats['max_drawdown']),
+        'preco_max_52w': f"{prefix}{stats['preco_max_52w']:.2f}",
+        'preco_min_52w': f"{prefix}{stats['preco_min_52w']:.2f}",
+        'volume_medio': format_number(stats['volume_medio']),
+    }
+
+
+@st.cache_data(ttl=600)
+def build_interpretations(fund: dict, stats: dict, benchmark: dict, risk_free: float):
+    """
+    Build the automated interpretation for the stock with cache
+    
+    Returns:
+        List of (emoji, title, description) tuples
+    """
+    interpretations = []
+    
+    # P/E compared with sector
+    if fund['pl'] and fund['pl'] > 0:
+        pl_vs_setor = fund['pl'] / benchmark['pl_medio']
+        if pl_vs_setor < 0.7:
+            interpretations.append(("✅", "P/E below sector", 
+                f"P/E of {fund['pl']:.1f} is {(1-pl_vs_setor)*100:.0f}% below sector average ({benchmark['pl_medio']})"))
+        elif pl_vs_setor > 1.5:
+            interpretations.append(("⚠️", "P/E above sector", 
+                f"P/E of {fund['pl']:.1f} is {(pl_vs_setor-1)*100:.0f}% above sector average ({benchmark['pl_medio']})"))
+        else:
+            interpretations.append(("➖", "P/E aligned with sector", 
+                f"P/E of {fund['pl']:.1f} close to sector average ({benchmark['pl_medio']})"))
+    elif fund['pl'] and fund['pl'] < 0:
+        interpretations.append(("🔴", "Negative P/E", "Company with loss in the period"))
+    
+    # P/B compared with sector
+    if fund['pvp'] and fund['pvp'] > 0:
+        pvp_vs_setor = fund['pvp'] / benchmark['pvp_medio']
+        if pvp_vs_setor < 0.7:
+            interpretations.append(("✅", "P/B below sector", 
+                f"P/B of {fund['pvp']:.2f} suggests book value discount"))
+        elif pvp_vs_setor > 1.5:
+            interpretations.append(("⚠️", "P/B above sector", 
+                f"P/B of {fund['pvp']:.2f} may indicate overvaluation"))
+    
+    # ROE
+    if fund['roe']:
+        if fund['roe'] > 0.20:
+            interpretations.append(("✅", "Excellent ROE (>20%)", "High return on equity"))
+        elif fund['roe'] > 0.15:
+            interpretations.append(("✅", "Good ROE (>15%)", "Good return on equity"))
+        elif fund['roe'] < 0.08:
+            interpretations.append(("⚠️", "Low ROE (<8%)", "Low profitability"))
+    
+    # DY compared with sector
+    if fund['dividend_yield']:
+        dy_vs_setor = fund['dividend_yield'] / benchmark['dy_medio'] if benchmark['dy_medio'] > 0 else 1
+        if dy_vs_setor > 1.5:
+            interpretations.append(("✅", "DY above sector", 
+                f"Dividend Yield of {fund['dividend_yield']*100:.2f}% above sector average"))
+        if fund['dividend_yield'] > 0.08:
+            interpretations.append(("✅", "Very high DY (>8%)", "Excellent dividend payer"))
+    
+    # Performance vs risk-free
+    if stats['retorno_anualizado'] > risk_free/100:
+        interpretations.append(("✅", "Beat risk-free rate", 
+            f"Return of {stats['retorno_anualizado']*100:.1f}% exceeded risk-free ({risk_free:.1f}%)"))
+    elif stats['retorno_total'] < -0.20:
+        interpretations.append(("⚠️", "Significant decline", 
+            f"Stock dropped {abs(stats['retorno_total'])*100:.1f}% in the period"))
+    
+    # Sharpe
+    if stats['sharpe_ratio'] > 1.5:
+        interpretations.append(("✅", "Excellent Sharpe (>1.5)", "Great risk-adjusted return"))
+    elif stats['sharpe_ratio'] > 1:
+        interpretations.append(("✅", "Good Sharpe (>1)", "Good risk-adjusted return"))
+    elif stats['sharpe_ratio'] < 0:
+        interpretations.append(("⚠️", "Negative Sharpe", "Return below risk-free rate"))
+    
+    # Volatility
+    if stats['volatilidade_anual'] > 0.50:
+        interpretations.append(("⚠️", "High volatility (>50%)", "High risk stock"))
+    elif stats['volatilidade_anual'] < 0.25:
+        interpretations.append(("✅", "Low volatility (<25%)", "Defensive stock"))
+    
+    return interpretations
+
+
+def _history_fingerprint(history: pd.DataFrame):
+    """Lightweight history hash for the figure cache (length, last date and last price)"""
+    if history.empty:
+        return (0, None, None)
+    return (len(history), history.index[-1].value, float(history['Close'].iloc[-1]))
+
+
+# Plotly figures live in cache_resource (same object on every rerun), keyed by the lightweight history hash
+FIGURE_CACHE = dict(hash_funcs={pd.DataFrame: _history_fingerprint}, max_entries=64)
+
+
+@st.cache_resource(**FIGURE_CACHE)
+def create_price_chart(history: pd.DataFrame, ticker: str, show_ma: tuple = MA_DEFAULT):
     """Create interactive price chart with Plotly"""
     fig = make_subplots(
         rows=2, cols=1,
@@ -167,7 +450,6 @@ def create_price_chart(history: pd.DataFrame, ticker: str, show_ma: list = [20,
     )
     
     # Moving averages
-    colors = {20: '#e74c3c', 50: '#f39c12', 200: '#9b59b6'}
     for period in show_ma:
         ma = history['Close'].rolling(period).mean()
         fig.add_trace(
@@ -176,7 +458,7 @@ def create_price_chart(history: pd.DataFrame, ticker: str, show_ma: list = [20,
                 y=ma,
                 mode='lines',
                 name=f'MA{period}',
-                line=dict(color=colors.get(period, '#1f77b4'), width=1)
+                line=dict(color=MA_COLORS.get(period, '#1f77b4'), width=1)
             ),
             row=1, col=1
         )
@@ -198,13 +480,13 @@ def create_price_chart(history: pd.DataFrame, ticker: str, show_ma: list = [20,
     fig.update_layout(
         height=600,
         xaxis_rangeslider_visible=False,
-        template='plotly_white',
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
     )
     
     return fig
 
 
+@st.cache_resource(**FIGURE_CACHE)
 def create_returns_chart(history: pd.DataFrame, ticker: str):
     """Create cumulative returns chart"""
     returns = history['Close'].pct_change()
@@ -226,13 +508,62 @@ def create_returns_chart(history: pd.DataFrame, ticker: str):
     fig.update_layout(
         title=f'{ticker} - Cumulative Return',
         yaxis_title='Return (%)',
-        template='plotly_white',
         height=400
     )
     
     return fig
 
 
+@st.cache_resource(**FIGURE_CACHE)
+def create_drawdown_chart(history: pd.DataFrame, ticker: str):
+    """Create drawdown chart"""
+    close = history['Close'].to_numpy()
+    cummax = np.fmax.accumulate(close)
+    drawdown = (close - cummax) / cummax * 100
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=history.index,
+        y=drawdown,
+        fill='tozeroy',
+        fillcolor='rgba(231, 76, 60, 0.3)',
+        line=dict(color='#e74c3c'),
+        name='Drawdown'
+    ))
+    fig.update_layout(
+        title=f'{ticker} - Drawdown',
+        yaxis_title='Drawdown (%)',
+        height=400
+    )
+    
+    return fig
+
+
+@st.cache_resource(**FIGURE_CACHE)
+def create_returns_histogram(history: pd.DataFrame, ticker: str):
+    """Create daily returns histogram (the ticker is part of the cache key)"""
+    close = history['Close'].to_numpy()
+    returns = np.diff(close) / close[:-1] * 100
+    returns = returns[np.isfinite(returns)]
+    
+    # Bins computed directly with NumPy (skips Plotly Express column inference)
+    counts, edges = np.histogram(returns, bins=50)
+    centers = (edges[:-1] + edges[1:]) / 2
+    
+    fig = go.Figure(go.Bar(x=centers, y=counts, width=np.diff(edges)))
+    fig.add_vline(x=returns.mean(), line_dash="dash", line_color="red",
+                  annotation_text=f"Mean: {returns.mean():.2f}%")
+    fig.update_layout(
+        title="Daily Returns Distribution",
+        xaxis_title='Return (%)',
+        yaxis_title='Frequency',
+        showlegend=False,
+        bargap=0
+    )
+    
+    return fig
+
+
 def create_comparison_chart(histories: dict, normalize: bool = True):
     """Create comparison chart for multiple stocks"""
     fig = go.Figure()
@@ -256,7 +587,6 @@ def create_comparison_chart(histories: dict, normalize: bool = True):
     fig.update_layout(
         title=title,
         yaxis_title='Base 100' if normalize else 'Price',
-        template='plotly_white',
         height=500,
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
     )
@@ -264,6 +594,23 @@ def create_comparison_chart(histories: dict, normalize: bool = True):
     return fig
 
 
+def create_metrics_grid(data: pd.DataFrame, metrics: tuple = COMPARISON_METRICS):
+    """Create a 2x2 bar grid comparing the metrics across stocks"""
+    fig = make_subplots(rows=2, cols=2, subplot_titles=[title for _, title, _ in metrics])
+    
+    for i, (metric, _, scale) in enumerate(metrics):
+        fig.add_trace(go.Bar(
+            x=data['ticker'],
+            y=data[metric],
+            marker=dict(color=data[metric], colorscale=scale),
+            showlegend=False
+        ), row=i // 2 + 1, col=i % 2 + 1)
+    
+    fig.update_layout(height=800)
+    
+    return fig
+
+
 def create_fundamentals_chart(data: pd.DataFrame, metric: str, title: str):
     """Create bar chart for fundamentals comparison"""
     fig = go.Figure()
@@ -280,7 +627,6 @@ def create_fundamentals_chart(data: pd.DataFrame, metric: str, title: str):
     
     fig.update_layout(
         title=title,
-        template='plotly_white',
         height=400
     )
     
@@ -304,20 +650,12 @@ with st.sidebar:
     st.markdown("---")
     
     # Period
-    period_options = {
-        "1 month": "1mo",
-        "3 months": "3mo",
-        "6 months": "6mo",
-        "1 year": "1y",
-        "2 years": "2y",
-        "5 years": "5y"
-    }
     selected_period = st.selectbox(
         "Analysis period",
-        options=list(period_options.keys()),
+        options=list(PERIOD_OPTIONS.keys()),
         index=3  # Default: 1 year
     )
-    period = period_options[selected_period]
+    period = PERIOD_OPTIONS[selected_period]
     
     st.markdown("---")
     st.markdown("**Popular tickers:**")
@@ -378,7 +716,11 @@ if page == "🏠 Home":
     
     # Quick stats
     st.markdown("### 🚀 Quick Analysis")
-    quick_ticker = st.text_input("Enter a ticker for quick analysis:", value="AAPL").upper()
+    st.session_state.setdefault("quick_ticker", "AAPL")
+    st.text_input("Enter a ticker for quick analysis:", value=st.session_state["quick_ticker"],
+                  key="quick_ticker_input", on_change=normalize_ticker,
+                  args=("quick_ticker_input", "quick_ticker"))
+    quick_ticker = st.session_state["quick_ticker"]
     
     if st.button("Analyze", type="primary"):
         with st.spinner(f"Fetching data for {quick_ticker}..."):
@@ -401,22 +743,36 @@ if page == "🏠 Home":
 elif page == "📊 Single Stock":
     st.title("📊 Single Stock Analysis")
     
-    ticker = st.text_input("Enter ticker:", value="AAPL").upper()
+    st.session_state.setdefault("ticker", "AAPL")
+    st.text_input("Enter ticker:", value=st.session_state["ticker"],
+                  key="ticker_input", on_change=normalize_ticker,
+                  args=("ticker_input", "ticker"))
+    ticker = st.session_state["ticker"]
+    
+    # Only run the analysis after a click; reruns from other widgets reuse the analyzed ticker
+    if st.button("Analyze", type="primary"):
+        st.session_state["analyzed_ticker"] = ticker
     
-    if st.button("Analyze", type="primary") or ticker:
+    if ticker and st.session_state.get("analyzed_ticker") == ticker:
         with st.spinner(f"Loading data for {ticker}..."):
             try:
                 basic, fund, history = fetch_stock_data(ticker, period)
-                analyzer = StockAnalyzer(history)
-                stats = analyzer.get_summary_stats()
+                stats = compute_stats(ticker, period)
                 
                 # Detect currency
                 is_brazilian = '.SA' in ticker or ticker.endswith('.SA')
                 currency = "R$" if is_brazilian else "$"
+                formatted = format_view_model(basic, fund, stats, currency)
+                
+                # Values used across several sections
+                preco_atual = basic['preco_atual']
+                setor = basic['setor']
+                lpa, vpa = fund['lpa'], fund['vpa']
+                dy = fund['dividend_yield'] or 0
                 
                 # Header with basic info
                 st.markdown(f"## {basic['nome']}")
-                st.markdown(f"**Sector:** {basic['setor']} | **Industry:** {basic['industria']}")
+                st.markdown(f"**Sector:** {setor} | **Industry:** {basic['industria']}")
                 
                 st.markdown("---")
                 
@@ -425,31 +781,35 @@ elif page == "📊 Single Stock":
                 
                 col1.metric(
                     "Current Price",
-                    f"{currency} {basic['preco_atual']:.2f}",
-                    f"{stats['retorno_total']*100:.1f}% ({selected_period})"
+                    formatted['preco_atual'],
+                    f"{formatted['retorno_periodo']} ({selected_period})"
                 )
-                col2.metric("Market Cap", format_number(basic['market_cap'], prefix=f"{currency} "))
-                col3.metric("P/E", f"{fund['pl']:.2f}" if fund['pl'] else "N/A")
-                col4.metric("P/B", f"{fund['pvp']:.2f}" if fund['pvp'] else "N/A")
-                col5.metric("Dividend Yield", format_percent(fund['dividend_yield']))
+                col2.metric("Market Cap", formatted['market_cap'])
+                col3.metric("P/E", formatted['pl'])
+                col4.metric("P/B", formatted['pvp'])
+                col5.metric("Dividend Yield", formatted['dividend_yield'])
                 
                 st.markdown("---")
                 
-                # Fetch macro data for context
-                macro_data = fetch_macro_data()
+                # Fetch macro data for context (BCB data only applies to Brazilian stocks)
+                macro_data = fetch_macro_data() if is_brazilian else {}
                 
-                # Tabs
-                tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-                    "📈 Charts", "📋 Fundamentals", "📊 Performance", 
-                    "💰 Valuation", "🌍 Macro Context", "💡 Interpretation"
-                ])
+                # Sections - only the selected one is built (st.tabs renders all of them on every rerun)
+                section = st.radio(
+                    "Section",
+                    ["📈 Charts", "📋 Fundamentals", "📊 Performance", 
+                     "💰 Valuation", "🌍 Macro Context", "💡 Interpretation"],
+                    horizontal=True,
+                    key="active_section",
+                    label_visibility="collapsed"
+                )
                 
-                with tab1:
+                if section == "📈 Charts":
                     # Moving averages selector
                     ma_options = st.multiselect(
                         "Moving Averages:",
-                        [20, 50, 100, 200],
-                        default=[20, 50]
+                        MA_OPTIONS,
+                        default=MA_DEFAULT
                     )
                     
                     st.plotly_chart(
@@ -462,119 +822,78 @@ elif page == "📊 Single Stock":
                         st.plotly_chart(create_returns_chart(history, ticker), use_container_width=True)
                     
                     with col2:
-                        # Drawdown chart
-                        cummax = history['Close'].cummax()
-                        drawdown = (history['Close'] - cummax) / cummax * 100
-                        
-                        fig_dd = go.Figure()
-                        fig_dd.add_trace(go.Scatter(
-                            x=history.index,
-                            y=drawdown,
-                            fill='tozeroy',
-                            fillcolor='rgba(231, 76, 60, 0.3)',
-                            line=dict(color='#e74c3c'),
-                            name='Drawdown'
-                        ))
-                        fig_dd.update_layout(
-                            title=f'{ticker} - Drawdown',
-                            yaxis_title='Drawdown (%)',
-                            template='plotly_white',
-                            height=400
-                        )
-                        st.plotly_chart(fig_dd, use_container_width=True)
+                        st.plotly_chart(create_drawdown_chart(history, ticker), use_container_width=True)
                 
-                with tab2:
+                elif section == "📋 Fundamentals":
                     col1, col2 = st.columns(2)
                     
                     with col1:
                         st.markdown("### Valuation Multiples")
-                        fund_data = {
-                            "Indicator": ["P/E", "P/B", "EV/EBITDA", "P/S"],
-                            "Value": [
-                                f"{fund['pl']:.2f}" if fund['pl'] else "N/A",
-                                f"{fund['pvp']:.2f}" if fund['pvp'] else "N/A",
-                                f"{fund['ev_ebitda']:.2f}" if fund.get('ev_ebitda') else "N/A",
-                                f"{fund['psr']:.2f}" if fund.get('psr') else "N/A"
-                            ]
-                        }
-                        st.table(pd.DataFrame(fund_data))
+                        fund_data = (
+                            ("P/E", formatted['pl']),
+                            ("P/B", formatted['pvp']),
+                            ("EV/EBITDA", formatted['ev_ebitda']),
+                            ("P/S", formatted['psr']),
+                        )
+                        st.markdown(markdown_table(("Indicator", "Value"), fund_data))
                     
                     with col2:
                         st.markdown("### Profitability")
-                        rent_data = {
-                            "Indicator": ["ROE", "ROA", "Net Margin", "Gross Margin", "Dividend Yield", "Payout"],
-                            "Value": [
-                                format_percent(fund['roe']),
-                                format_percent(fund.get('roa')),
-                                format_percent(fund['margem_liquida']),
-                                format_percent(fund.get('margem_bruta')),
-                                format_percent(fund['dividend_yield']),
-                                format_percent(fund['payout_ratio'])
-                            ]
-                        }
-                        st.table(pd.DataFrame(rent_data))
+                        rent_data = (
+                            ("ROE", formatted['roe']),
+                            ("ROA", formatted['roa']),
+                            ("Net Margin", formatted['margem_liquida']),
+                            ("Gross Margin", formatted['margem_bruta']),
+                            ("Dividend Yield", formatted['dividend_yield']),
+                            ("Payout", formatted['payout_ratio']),
+                        )
+                        st.markdown(markdown_table(("Indicator", "Value"), rent_data))
                     
                     st.markdown("### Financial Data")
                     col1, col2 = st.columns(2)
                     with col1:
-                        fin_data = {
-                            "Item": ["EPS", "Book Value/Share", "Total Revenue", "Net Income"],
-                            "Value": [
-                                f"{currency} {fund['lpa']:.2f}" if fund['lpa'] else "N/A",
-                                f"{currency} {fund['vpa']:.2f}" if fund['vpa'] else "N/A",
-                                format_number(fund['receita_total'], prefix=f"{currency} "),
-                                format_number(fund['lucro_liquido'], prefix=f"{currency} ")
-                            ]
-                        }
-                        st.table(pd.DataFrame(fin_data))
+                        fin_data = (
+                            ("EPS", formatted['lpa']),
+                            ("Book Value/Share", formatted['vpa']),
+                            ("Total Revenue", formatted['receita_total']),
+                            ("Net Income", formatted['lucro_liquido']),
+                        )
+                        st.markdown(markdown_table(("Item", "Value"), fin_data))
                     with col2:
-                        fin_data2 = {
-                            "Item": ["EBITDA", "Enterprise Value", "Debt/Equity"],
-                            "Value": [
-                                format_number(fund.get('ebitda'), prefix=f"{currency} "),
-                                format_number(fund.get('enterprise_value'), prefix=f"{currency} "),
-                                f"{fund['divida_patrimonio']:.2f}" if fund.get('divida_patrimonio') else "N/A"
-                            ]
-                        }
-                        st.table(pd.DataFrame(fin_data2))
+                        fin_data2 = (
+                            ("EBITDA", formatted['ebitda']),
+                            ("Enterprise Value", formatted['enterprise_value']),
+                            ("Debt/Equity", formatted['divida_patrimonio']),
+                        )
+                        st.markdown(markdown_table(("Item", "Value"), fin_data2))
                 
-                with tab3:
+                elif section == "📊 Performance":
                     col1, col2, col3, col4 = st.columns(4)
                     
-                    col1.metric("Total Return", format_percent(stats['retorno_total']))
-                    col2.metric("Annualized Return", format_percent(stats['retorno_anualizado']))
-                    col3.metric("Volatility", format_percent(stats['volatilidade_anual']))
-                    col4.metric("Sharpe Ratio", f"{stats['sharpe_ratio']:.2f}")
+                    col1.metric("Total Return", formatted['retorno_total'])
+                    col2.metric("Annualized Return", formatted['retorno_anualizado'])
+                    col3.metric("Volatility", formatted['volatilidade_anual'])
+                    col4.metric("Sharpe Ratio", formatted['sharpe_ratio'])
                     
                     col1, col2, col3, col4 = st.columns(4)
-                    col1.metric("Max Drawdown", format_percent(stats['max_drawdown']))
-                    col2.metric("52w High", f"{currency} {stats['preco_max_52w']:.2f}")
-                    col3.metric("52w Low", f"{currency} {stats['preco_min_52w']:.2f}")
-                    col4.metric("Avg Volume", format_number(stats['volume_medio']))
+                    col1.metric("Max Drawdown", formatted['max_drawdown'])
+                    col2.metric("52w High", formatted['preco_max_52w'])
+                    col3.metric("52w Low", formatted['preco_min_52w'])
+                    col4.metric("Avg Volume", formatted['volume_medio'])
                     
                     # Returns distribution
-                    returns = history['Close'].pct_change().dropna() * 100
-                    fig_hist = px.histogram(
-                        returns,
-                        nbins=50,
-                        title="Daily Returns Distribution",
-                        labels={'value': 'Return (%)', 'count': 'Frequency'}
-                    )
-                    fig_hist.add_vline(x=returns.mean(), line_dash="dash", line_color="red",
-                                       annotation_text=f"Mean: {returns.mean():.2f}%")
-                    fig_hist.update_layout(template='plotly_white', showlegend=False)
-                    st.plotly_chart(fig_hist, use_container_width=True)
+                    st.plotly_chart(create_returns_histogram(history, ticker), use_container_width=True)
                 
-                with tab4:
+                elif section == "💰 Valuation":
                     st.markdown("### 💰 Valuation - Fair Price")
                     
                     # Get sector benchmark for normalized DY
-                    benchmark = get_sector_benchmark(basic['setor'])
+                    benchmark = get_sector_benchmark(setor)
                     
                     # Calculate DPA (Dividend per Share)
                     dpa = 0
-                    if fund['dividend_yield'] and basic['preco_atual']:
-                        dpa = fund['dividend_yield'] * basic['preco_atual']
+                    if dy and preco_atual:
+                        dpa = dy * preco_atual
                     
                     selic = macro_data.get('selic', 10.75) or 10.75
                     
@@ -589,9 +908,9 @@ elif page == "📊 Single Stock":
                         to find stocks with margin of safety.
                         """)
                         
-                        pj_graham = graham_formula_original(fund['lpa'], fund['vpa'])
+                        pj_graham = graham_formula_original(lpa, vpa)
                         if pj_graham:
-                            margem = (pj_graham - basic['preco_atual']) / pj_graham * 100
+                            margem = (pj_graham - preco_atual) / pj_graham * 100
                             
                             st.metric(
                                 "Fair Price (Graham)",
@@ -599,14 +918,8 @@ elif page == "📊 Single Stock":
                                 f"{margem:.1f}% {'discount' if margem > 0 else 'premium'}"
                             )
                             
-                            if margem >= 30:
-                                st.success("🟢 VERY CHEAP - High margin of safety")
-                            elif margem >= 15:
-                                st.success("🟢 CHEAP - Good margin of safety")
-                            elif margem >= -10:
-                                st.info("🟡 FAIR PRICE")
-                            else:
-                                st.warning("🔴 EXPENSIVE - Above fair price")
+                            nivel, mensagem = margin_verdict(margem, 'graham')
+                            getattr(st, nivel)(mensagem)
                         else:
                             st.warning("Insufficient data (negative or unavailable EPS/BVPS)")
                     
@@ -620,12 +933,11 @@ elif page == "📊 Single Stock":
                         """)
                         
                         # Check if DY is abnormally high (extraordinary dividend)
-                        dy_atual = fund['dividend_yield'] or 0
-                        dy_extraordinario = dy_atual > 0.15  # DY > 15% is suspicious
+                        dy_extraordinario = dy > 0.15  # DY > 15% is suspicious
                         
-                        if dy_extraordinario and dy_atual > 0:
+                        if dy_extraordinario and dy > 0:
                             st.warning(f"""
-                            ⚠️ **DY of {dy_atual*100:.1f}% seems extraordinary!**
+                            ⚠️ **DY of {dy*100:.1f}% seems extraordinary!**
                             
                             Probably includes special dividends (extra payouts, reserve distribution).
                             Bazin assumes **recurring and sustainable** dividends.
@@ -636,13 +948,13 @@ elif page == "📊 Single Stock":
                             
                             # Suggest normalized DY based on sector
                             dy_normalizado = benchmark.get('dy_medio', 0.06)
-                            dpa_normalizado = dy_normalizado * basic['preco_atual']
+                            dpa_normalizado = dy_normalizado * preco_atual
                             pj_bazin_normalizado = bazin_formula(dpa_normalizado)
                             
                             st.markdown(f"**Using normalized sector DY ({dy_normalizado*100:.0f}%):**")
                             
                             if pj_bazin_normalizado:
-                                margem = (pj_bazin_normalizado - basic['preco_atual']) / pj_bazin_normalizado * 100
+                                margem = (pj_bazin_normalizado - preco_atual) / pj_bazin_normalizado * 100
                                 
                                 st.metric(
                                     "Fair Price (Bazin Normalized)",
@@ -650,14 +962,8 @@ elif page == "📊 Single Stock":
                                     f"{margem:.1f}% {'discount' if margem > 0 else 'premium'}"
                                 )
                                 
-                                if margem >= 30:
-                                    st.success("🟢 VERY CHEAP for dividends (normalized)")
-                                elif margem >= 15:
-                                    st.success("🟢 CHEAP for dividends (normalized)")
-                                elif margem >= -10:
-                                    st.info("🟡 FAIR PRICE for dividends (normalized)")
-                                else:
-                                    st.warning("🔴 DY below 6% at current price (normalized)")
+                                nivel, mensagem = margin_verdict(margem, 'bazin_normalizado')
+                                getattr(st, nivel)(mensagem)
                             
                             # Show distorted value for reference
                             with st.expander("View calculation with current DY (distorted)"):
@@ -668,7 +974,7 @@ elif page == "📊 Single Stock":
                             # Normal DY - use standard calculation
                             pj_bazin = bazin_formula(dpa)
                             if pj_bazin:
-                                margem = (pj_bazin - basic['preco_atual']) / pj_bazin * 100
+                                margem = (pj_bazin - preco_atual) / pj_bazin * 100
                                 
                                 st.metric(
                                     "Fair Price (Bazin)",
@@ -676,35 +982,26 @@ elif page == "📊 Single Stock":
                                     f"{margem:.1f}% {'discount' if margem > 0 else 'premium'}"
                                 )
                                 
-                                if margem >= 30:
-                                    st.success("🟢 VERY CHEAP for dividends")
-                                elif margem >= 15:
-                                    st.success("🟢 CHEAP for dividends")
-                                elif margem >= -10:
-                                    st.info("🟡 FAIR PRICE for dividends")
-                                else:
-                                    st.warning("🔴 DY below 6% at current price")
+                                nivel, mensagem = margin_verdict(margem, 'bazin')
+                                getattr(st, nivel)(mensagem)
                             else:
                                 st.warning("Company doesn't pay dividends or data unavailable")
                     
                     # Summary
                     st.markdown("---")
                     st.markdown("#### 📊 Data used in calculation")
-                    calc_data = {
-                        "Variable": ["EPS", "BVPS", "DPS (estimated)", "Current Price", "Risk-free Rate"],
-                        "Value": [
-                            f"{currency} {fund['lpa']:.2f}" if fund['lpa'] else "N/A",
-                            f"{currency} {fund['vpa']:.2f}" if fund['vpa'] else "N/A",
-                            f"{currency} {dpa:.2f}" if dpa else "N/A",
-                            f"{currency} {basic['preco_atual']:.2f}",
-                            f"{selic:.2f}%" if is_brazilian else "~5%"
-                        ]
-                    }
-                    st.table(pd.DataFrame(calc_data))
+                    calc_data = (
+                        ("EPS", formatted['lpa']),
+                        ("BVPS", formatted['vpa']),
+                        ("DPS (estimated)", f"{currency} {dpa:.2f}" if dpa else "N/A"),
+                        ("Current Price", formatted['preco_atual']),
+                        ("Risk-free Rate", f"{selic:.2f}%" if is_brazilian else "~5%"),
+                    )
+                    st.markdown(markdown_table(("Variable", "Value"), calc_data))
                     
                     st.caption("⚠️ These models are simplified. Use as reference, not as investment advice.")
                 
-                with tab5:
+                elif section == "🌍 Macro Context":
                     st.markdown("### 🌍 Macroeconomic Context")
                     
                     if is_brazilian:
@@ -771,31 +1068,16 @@ elif page == "📊 Single Stock":
                     st.markdown("---")
                     st.markdown("#### 🏦 Sector Sensitivity")
                     
-                    setor = basic['setor']
-                    
-                    sensibilidade_juros = {
-                        'Financial Services': ('High', 'Banks benefit from high rates (spread)'),
-                        'Banks': ('High', 'Banking spread increases with high rates'),
-                        'Real Estate': ('High negative', 'High rates make financing expensive'),
-                        'Utilities': ('Medium', 'Predictable revenue, but debt sensitive to rates'),
-                        'Consumer Cyclical': ('High negative', 'Consumption drops with expensive credit'),
-                        'Technology': ('Medium negative', 'Valuations compress with high rates'),
-                        'Consumer Defensive': ('Low', 'Inelastic demand'),
-                        'Energy': ('Low', 'Commodities follow their own cycle'),
-                        'Basic Materials': ('Low', 'More tied to global cycle'),
-                    }
-                    
-                    if setor in sensibilidade_juros:
-                        sens, explicacao = sensibilidade_juros[setor]
+                    if setor in SECTOR_RATE_SENSITIVITY:
+                        sens, explicacao = SECTOR_RATE_SENSITIVITY[setor]
                         st.info(f"**{setor}** — Interest rate sensitivity: **{sens}**\n\n{explicacao}")
                     else:
                         st.info(f"Sector: {setor}")
                 
-                with tab6:
+                elif section == "💡 Interpretation":
                     st.markdown("### 💡 Automated Interpretation")
                     
                     # Get sector benchmark
-                    setor = basic['setor']
                     benchmark = get_sector_benchmark(setor)
                     
                     st.markdown(f"**Sector:** {setor}")
@@ -803,73 +1085,8 @@ elif page == "📊 Single Stock":
                     
                     st.markdown("---")
                     
-                    interpretations = []
-                    
-                    # P/E compared with sector
-                    if fund['pl'] and fund['pl'] > 0:
-                        pl_vs_setor = fund['pl'] / benchmark['pl_medio']
-                        if pl_vs_setor < 0.7:
-                            interpretations.append(("✅", "P/E below sector", 
-                                f"P/E of {fund['pl']:.1f} is {(1-pl_vs_setor)*100:.0f}% below sector average ({benchmark['pl_medio']})"))
-                        elif pl_vs_setor > 1.5:
-                            interpretations.append(("⚠️", "P/E above sector", 
-                                f"P/E of {fund['pl']:.1f} is {(pl_vs_setor-1)*100:.0f}% above sector average ({benchmark['pl_medio']})"))
-                        else:
-                            interpretations.append(("➖", "P/E aligned with sector", 
-                                f"P/E of {fund['pl']:.1f} close to sector average ({benchmark['pl_medio']})"))
-                    elif fund['pl'] and fund['pl'] < 0:
-                        interpretations.append(("🔴", "Negative P/E", "Company with loss in the period"))
-                    
-                    # P/B compared with sector
-                    if fund['pvp'] and fund['pvp'] > 0:
-                        pvp_vs_setor = fund['pvp'] / benchmark['pvp_medio']
-                        if pvp_vs_setor < 0.7:
-                            interpretations.append(("✅", "P/B below sector", 
-                                f"P/B of {fund['pvp']:.2f} suggests book value discount"))
-                        elif pvp_vs_setor > 1.5:
-                            interpretations.append(("⚠️", "P/B above sector", 
-                                f"P/B of {fund['pvp']:.2f} may indicate overvaluation"))
-                    
-                    # ROE
-                    if fund['roe']:
-                        if fund['roe'] > 0.20:
-                            interpretations.append(("✅", "Excellent ROE (>20%)", "High return on equity"))
-                        elif fund['roe'] > 0.15:
-                            interpretations.append(("✅", "Good ROE (>15%)", "Good return on equity"))
-                        elif fund['roe'] < 0.08:
-                            interpretations.append(("⚠️", "Low ROE (<8%)", "Low profitability"))
-                    
-                    # DY compared with sector
-                    if fund['dividend_yield']:
-                        dy_vs_setor = fund['dividend_yield'] / benchmark['dy_medio'] if benchmark['dy_medio'] > 0 else 1
-                        if dy_vs_setor > 1.5:
-                            interpretations.append(("✅", "DY above sector", 
-                                f"Dividend Yield of {fund['dividend_yield']*100:.2f}% above sector average"))
-                        if fund['dividend_yield'] > 0.08:
-                            interpretations.append(("✅", "Very high DY (>8%)", "Excellent dividend payer"))
-                    
-                    # Performance vs risk-free
                     risk_free = (macro_data.get('selic', 10.75) or 10.75) if is_brazilian else 5.0
-                    if stats['retorno_anualizado'] > risk_free/100:
-                        interpretations.append(("✅", "Beat risk-free rate", 
-                            f"Return of {stats['retorno_anualizado']*100:.1f}% exceeded risk-free ({risk_free:.1f}%)"))
-                    elif stats['retorno_total'] < -0.20:
-                        interpretations.append(("⚠️", "Significant decline", 
-                            f"Stock dropped {abs(stats['retorno_total'])*100:.1f}% in the period"))
-                    
-                    # Sharpe
-                    if stats['sharpe_ratio'] > 1.5:
-                        interpretations.append(("✅", "Excellent Sharpe (>1.5)", "Great risk-adjusted return"))
-                    elif stats['sharpe_ratio'] > 1:
-                        interpretations.append(("✅", "Good Sharpe (>1)", "Good risk-adjusted return"))
-                    elif stats['sharpe_ratio'] < 0:
-                        interpretations.append(("⚠️", "Negative Sharpe", "Return below risk-free rate"))
-                    
-                    # Volatility
-                    if stats['volatilidade_anual'] > 0.50:
-                        interpretations.append(("⚠️", "High volatility (>50%)", "High risk stock"))
-                    elif stats['volatilidade_anual'] < 0.25:
-                        interpretations.append(("✅", "Low volatility (<25%)", "Defensive stock"))
+                    interpretations = build_interpretations(fund, stats, benchmark, risk_free)
                     
                     for emoji, title, desc in interpretations:
                         st.markdown(f"{emoji} **{title}** — {desc}")
@@ -891,7 +1108,7 @@ elif page == "⚖️ Compare Stocks":
         "Enter tickers separated by comma:",
         value="AAPL, MSFT, GOOGL, AMZN"
     )
-    tickers = [t.strip().upper() for t in tickers_input.split(',') if t.strip()]
+    tickers = list(dict.fromkeys(TICKER_RE.findall(tickers_input.upper())))
     
     if len(tickers) < 2:
         st.warning("Enter at least 2 tickers to compare.")
@@ -915,75 +1132,53 @@ elif page == "⚖️ Compare Stocks":
                         st.markdown("### 📋 Fundamentals Comparison")
                         
                         # Detect currency
-                        first_ticker = list(data.keys())[0]
+                        first_ticker = next(iter(data))
                         is_brazilian = '.SA' in first_ticker
                         currency = "R$" if is_brazilian else "$"
                         
-                        comp_data = []
+                        # Extract the fields in a single pass, column by column
+                        cols = {'ticker': [], 'preco': [], 'pl': [], 'pvp': [], 'dy': [], 'roe': [],
+                                'retorno': [], 'volatilidade': [], 'sharpe': []}
                         for ticker, d in data.items():
                             fund = d['fundamentals']
-                            basic = d['basic']
-                            analyzer = StockAnalyzer(d['history'])
-                            stats = analyzer.get_summary_stats()
-                            
-                            comp_data.append({
-                                'Ticker': ticker,
-                                'Price': f"{currency} {basic['preco_atual']:.2f}",
-                                'P/E': f"{fund['pl']:.2f}" if fund['pl'] else "N/A",
-                                'P/B': f"{fund['pvp']:.2f}" if fund['pvp'] else "N/A",
-                                'DY': format_percent(fund['dividend_yield']),
-                                'ROE': format_percent(fund['roe']),
-                                'Return': format_percent(stats['retorno_total']),
-                                'Volatility': format_percent(stats['volatilidade_anual']),
-                                'Sharpe': f"{stats['sharpe_ratio']:.2f}"
-                            })
+                            # Stats from the already loaded history; one failing ticker doesn't drop the table
+                            try:
+                                stats = summary_stats(d['history'])
+                            except Exception as e:
+                                st.warning(f"Could not compute statistics for {ticker}: {e}")
+                                stats = {}
+                            cols['ticker'].append(ticker)
+                            cols['preco'].append(d['basic']['preco_atual'])
+                            cols['pl'].append(fund['pl'])
+                            cols['pvp'].append(fund['pvp'])
+                            cols['dy'].append(fund['dividend_yield'])
+                            cols['roe'].append(fund['roe'])
+                            cols['retorno'].append(stats.get('retorno_total'))
+                            cols['volatilidade'].append(stats.get('volatilidade_anual'))
+                            cols['sharpe'].append(stats.get('sharpe_ratio'))
+                        raw = pd.DataFrame(cols)
                         
-                        df_comp = pd.DataFrame(comp_data)
+                        df_comp = pd.DataFrame({
+                            'Ticker': raw['ticker'],
+                            'Price': format_series(raw['preco'], f"{currency} {{:.2f}}"),
+                            'P/E': format_series(raw['pl']),
+                            'P/B': format_series(raw['pvp']),
+                            'DY': format_series(raw['dy'], "{:.2f}%", scale=100),
+                            'ROE': format_series(raw['roe'], "{:.2f}%", scale=100),
+                            'Return': format_series(raw['retorno'], "{:.2f}%", scale=100),
+                            'Volatility': format_series(raw['volatilidade'], "{:.2f}%", scale=100),
+                            'Sharpe': format_series(raw['sharpe'])
+                        })
                         st.dataframe(df_comp, use_container_width=True, hide_index=True)
                         
                         # Comparative bar charts
                         st.markdown("### 📊 Visual Comparison")
                         
-                        metrics_data = []
-                        for ticker, d in data.items():
-                            fund = d['fundamentals']
-                            metrics_data.append({
-                                'ticker': ticker,
-                                'pl': fund['pl'] if fund['pl'] else 0,
-                                'pvp': fund['pvp'] if fund['pvp'] else 0,
-                                'dy': (fund['dividend_yield'] or 0) * 100,
-                                'roe': (fund['roe'] or 0) * 100
-                            })
-                        
-                        df_metrics = pd.DataFrame(metrics_data)
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            fig_pl = px.bar(df_metrics, x='ticker', y='pl', title='P/E Ratio',
-                                           color='pl', color_continuous_scale='RdYlGn_r')
-                            fig_pl.update_layout(template='plotly_white', showlegend=False)
-                            st.plotly_chart(fig_pl, use_container_width=True)
+                        values = raw[['pl', 'pvp', 'dy', 'roe']].apply(pd.to_numeric, errors='coerce').fillna(0)
+                        df_metrics = raw[['ticker']].assign(pl=values['pl'], pvp=values['pvp'],
+                                                            dy=values['dy'] * 100, roe=values['roe'] * 100)
                         
-                        with col2:
-                            fig_roe = px.bar(df_metrics, x='ticker', y='roe', title='ROE (%)',
-                                            color='roe', color_continuous_scale='RdYlGn')
-                            fig_roe.update_layout(template='plotly_white', showlegend=False)
-                            st.plotly_chart(fig_roe, use_container_width=True)
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            fig_pvp = px.bar(df_metrics, x='ticker', y='pvp', title='P/B Ratio',
-                                            color='pvp', color_continuous_scale='RdYlGn_r')
-                            fig_pvp.update_layout(template='plotly_white', showlegend=False)
-                            st.plotly_chart(fig_pvp, use_container_width=True)
-                        
-                        with col2:
-                            fig_dy = px.bar(df_metrics, x='ticker', y='dy', title='Dividend Yield (%)',
-                                           color='dy', color_continuous_scale='RdYlGn')
-                            fig_dy.update_layout(template='plotly_white', showlegend=False)
-                            st.plotly_chart(fig_dy, use_container_width=True)
+                        st.plotly_chart(create_metrics_grid(df_metrics), use_container_width=True)
                         
                 except Exception as e:
                     st.error(f"Error: {e}")
@@ -997,16 +1192,12 @@ elif page == "🔍 Screener":
     st.markdown("Filter stocks by fundamental criteria.")
     
     # Stock universe
-    default_tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'NVDA', 
-                       'TSLA', 'JPM', 'V', 'JNJ', 'WMT', 'PG',
-                       'UNH', 'HD', 'BAC', 'XOM', 'PFE', 'KO']
-    
     with st.expander("⚙️ Configure stock universe"):
         tickers_input = st.text_area(
             "Tickers (one per line or comma-separated):",
-            value=", ".join(default_tickers)
+            value=", ".join(SCREENER_DEFAULT_TICKERS)
         )
-        tickers = [t.strip().upper() for t in tickers_input.replace('\n', ',').split(',') if t.strip()]
+        tickers = list(dict.fromkeys(TICKER_RE.findall(tickers_input.upper())))
     
     st.markdown("### 🎯 Filters")
     
@@ -1027,53 +1218,45 @@ elif page == "🔍 Screener":
     if st.button("🔍 Run Screener", type="primary"):
         with st.spinner(f"Analyzing {len(tickers)} stocks..."):
             try:
-                # Fetch data
+                # Fetch in parallel; progress advances as each stock completes
                 progress_bar = st.progress(0)
-                results = []
+                # Show the stocks already loaded while the rest arrive
+                preview = st.empty()
+                rows = {}
+                for done, (ticker, row) in enumerate(iter_screener_rows(tickers), start=1):
+                    if row is not None:
+                        rows[ticker] = row
+                        preview.dataframe(pd.DataFrame(list(rows.values())), use_container_width=True, hide_index=True)
+                    progress_bar.progress(done / len(tickers))
+                preview.empty()
                 
-                for i, ticker in enumerate(tickers):
-                    try:
-                        stock = StockFetcher(ticker)
-                        basic = stock.get_basic_info()
-                        fund = stock.get_fundamentals()
-                        
-                        results.append({
-                            'ticker': ticker,
-                            'name': basic['nome'],
-                            'sector': basic['setor'],
-                            'price': basic['preco_atual'],
-                            'pl': fund['pl'],
-                            'pvp': fund['pvp'],
-                            'dy': fund['dividend_yield'],
-                            'roe': fund['roe'],
-                            'margin': fund['margem_liquida']
-                        })
-                    except:
-                        pass
-                    
-                    progress_bar.progress((i + 1) / len(tickers))
+                # Keep the tickers' original order
+                results = [rows[ticker] for ticker in tickers if ticker in rows]
                 
                 df = pd.DataFrame(results)
                 
-                # Apply filters
-                if use_pl and not df.empty:
-                    df = df[(df['pl'] >= pl_range[0]) & (df['pl'] <= pl_range[1]) & (df['pl'] > 0)]
-                if use_dy and not df.empty:
-                    df = df[df['dy'] >= dy_min / 100]
-                if use_roe and not df.empty:
-                    df = df[df['roe'] >= roe_min / 100]
+                # Apply filters with a single mask
+                if not df.empty:
+                    mask = pd.Series(True, index=df.index)
+                    if use_pl:
+                        mask &= df['pl'].between(*pl_range) & (df['pl'] > 0)
+                    if use_dy:
+                        mask &= df['dy'] >= dy_min / 100
+                    if use_roe:
+                        mask &= df['roe'] >= roe_min / 100
+                    df = df[mask]
                 
                 st.success(f"Found {len(df)} stocks matching criteria.")
                 
                 if not df.empty:
                     # Format for display
                     df_display = df.copy()
-                    df_display['price'] = df_display['price'].apply(lambda x: f"${x:.2f}" if x else "N/A")
-                    df_display['pl'] = df_display['pl'].apply(lambda x: f"{x:.2f}" if x else "N/A")
-                    df_display['pvp'] = df_display['pvp'].apply(lambda x: f"{x:.2f}" if x else "N/A")
-                    df_display['dy'] = df_display['dy'].apply(lambda x: f"{x*100:.2f}%" if x else "N/A")
-                    df_display['roe'] = df_display['roe'].apply(lambda x: f"{x*100:.2f}%" if x else "N/A")
-                    df_display['margin'] = df_display['margin'].apply(lambda x: f"{x*100:.2f}%" if x else "N/A")
+                    df_display['price'] = format_series(df_display['price'], "${:.2f}")
+                    df_display['pl'] = format_series(df_display['pl'])
+                    df_display['pvp'] = format_series(df_display['pvp'])
+                    df_display['dy'] = format_series(df_display['dy'], "{:.2f}%", scale=100)
+                    df_display['roe'] = format_series(df_display['roe'], "{:.2f}%", scale=100)
+                    df_display['margin'] = format_series(df_display['margin'], "{:.2f}%", scale=100)
                     
                     df_display.columns = ['Ticker', 'Name', 'Sector', 'Price', 'P/E', 'P/B', 'DY', 'ROE', 'Net Margin']
                     
@@ -1087,19 +1270,19 @@ elif page == "🔍 Screener":
                     
                     with col1:
                         st.markdown("**💰 Lowest P/E (Value)**")
-                        value = df[df['pl'] > 0].nsmallest(5, 'pl')[['ticker', 'pl']]
+                        value = top_k(df[df['pl'] > 0], 'pl', largest=False)[['ticker', 'pl']]
                         value['pl'] = value['pl'].apply(lambda x: f"{x:.2f}")
                         st.dataframe(value, hide_index=True)
                     
                     with col2:
                         st.markdown("**💵 Highest DY (Dividends)**")
-                        div = df[df['dy'] > 0].nlargest(5, 'dy')[['ticker', 'dy']]
+                        div = top_k(df[df['dy'] > 0], 'dy')[['ticker', 'dy']]
                         div['dy'] = div['dy'].apply(lambda x: f"{x*100:.2f}%")
                         st.dataframe(div, hide_index=True)
                     
                     with col3:
                         st.markdown("**⭐ Highest ROE (Quality)**")
-                        qual = df[df['roe'] > 0].nlargest(5, 'roe')[['ticker', 'roe']]
+                        qual = top_k(df[df['roe'] > 0], 'roe')[['ticker', 'roe']]
                         qual['roe'] = qual['roe'].apply(lambda x: f"{x*100:.2f}%")
                         st.dataframe(qual, hide_index=True)
                 
@@ -5,9 +5,32 @@ import yfinance as yf
 import pandas as pd
 import time
 import random
+import threading
 from datetime import datetime, timedelta
 
 
+try:
+    from yfinance.exceptions import YFRateLimitError
+except ImportError:  # yfinance < 0.2.55 não tem exceção própria de rate limit
+    YFRateLimitError = None
+
+# Trechos da mensagem de rate limit em versões que levantam Exception genérica
+RATE_LIMIT_MESSAGES = ('rate limit', 'too many requests')
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    """Indica se a exceção é um rate limit (YFRateLimitError, HTTP 429 ou mensagem equivalente)"""
+    if YFRateLimitError is not None and isinstance(error, YFRateLimitError):
+        return True
+    # HTTPError do requests ou do curl_cffi (yfinance recente): ambos trazem .response
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) == 429:
+        return True
+    # yfinance antigo: Exception("Too Many Requests. Rate limited...")
+    message = str(error).lower()
+    return any(text in message for text in RATE_LIMIT_MESSAGES)
+
+
 def retry_on_rate_limit(max_retries=3, base_delay=2):
     """Decorator para retry em caso de rate limit"""
     def decorator(func):
@@ -16,33 +39,48 @@ def retry_on_rate_limit(max_retries=3, base_delay=2):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    error_msg = str(e).lower()
-                    if 'rate' in error_msg or 'limit' in error_msg or 'too many' in error_msg:
-                        if attempt < max_retries - 1:
-                            delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                            time.sleep(delay)
-                            continue
-                    raise e
+                    if _is_rate_limit(e) and attempt < max_retries - 1:
+                        delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
+                        time.sleep(delay)
+                        continue
+                    raise
             return func(*args, **kwargs)
         return wrapper
     return decorator
 
 
+# Validade (em segundos) do info memoizado por processo
+INFO_TTL = 600
+
+# Máximo de entradas no info memoizado
+INFO_CACHE_SIZE = 512
+
+# info memoizado por (ticker, ttl_bucket); ttl_bucket muda a cada INFO_TTL e invalida a entrada.
+# Acessado pelos pools de threads do screener e da comparação, por isso o lock
+_INFO_CACHE = {}
+_INFO_LOCK = threading.Lock()
+
+
 class StockFetcher:
     """Classe para buscar dados de ações da B3"""
     
-    def __init__(self, ticker: str):
+    # Uma instância por ticker (centenas num screener): sem __dict__ por instância
+    __slots__ = ('ticker', 'stock', '_info', '_history', '_history_key')
+    
+    def __init__(self, ticker: str, stock: yf.Ticker = None):
         """
         Inicializa o fetcher com um ticker
         
         Args:
             ticker: Código da ação (ex: 'ITUB4' ou 'ITUB4.SA')
+            stock: yf.Ticker já construído (ex: vindo de yf.Tickers), opcional
         """
         # Adiciona .SA se não tiver (padrão B3 no Yahoo Finance)
         self.ticker = ticker if ticker.endswith('.SA') else f"{ticker}.SA"
-        self.stock = yf.Ticker(self.ticker)
+        self.stock = stock if stock is not None else yf.Ticker(self.ticker)
         self._info = None
         self._history = None
+        self._history_key = None
     
     @property
     def info(self) -> dict:
@@ -53,8 +91,23 @@ class StockFetcher:
     
     @retry_on_rate_limit(max_retries=3, base_delay=2)
     def _fetch_info(self) -> dict:
-        """Busca info com retry"""
-        return self.stock.info
+        """Busca info com retry (memoizado entre instâncias do mesmo ticker)"""
+        bucket = int(time.time() // INFO_TTL)
+        key = (self.ticker, bucket)
+        with _INFO_LOCK:
+            info = _INFO_CACHE.get(key)
+        if info is None:
+            # A busca fica fora do lock para não serializar as threads na rede
+            info = self.stock.info
+            with _INFO_LOCK:
+                # Descarta entradas de janelas anteriores e, passando do limite, as mais antigas
+                for stale in [k for k in _INFO_CACHE if k[1] != bucket]:
+                    del _INFO_CACHE[stale]
+                _INFO_CACHE[key] = info
+                while len(_INFO_CACHE) > INFO_CACHE_SIZE:
+                    del _INFO_CACHE[next(iter(_INFO_CACHE))]
+        # Cópia: cada chamador pode alterar o seu dict sem afetar os demais
+        return dict(info)
     
     def get_history(self, period: str = "1y", interval: str = "1d") -> pd.DataFrame:
         """
@@ -67,34 +120,69 @@ class StockFetcher:
         Returns:
             DataFrame com OHLCV
         """
-        self._history = self.stock.history(period=period, interval=interval)
+        # Reaproveita o histórico já carregado (ex: pelo download em lote)
+        if self._history_key != (period, interval):
+            self._history = self.stock.history(period=period, interval=interval)
+            self._history_key = (period, interval)
         return self._history
     
     def get_current_price(self) -> float:
         """Retorna o preço atual"""
-        return self.info.get('currentPrice') or self.info.get('regularMarketPrice', 0)
+        return self._price_from(self.info)
+    
+    @staticmethod
+    def _price_from(info: dict) -> float:
+        """Extrai o preço atual de um info já lido"""
+        return info.get('currentPrice') or info.get('regularMarketPrice', 0)
     
     def get_basic_info(self) -> dict:
         """Retorna informações básicas formatadas"""
         info = self.info
+        return self._basic_from(info, self._price_from(info))
+    
+    def get_fundamentals(self, derive_ratios: bool = True) -> dict:
+        """
+        Retorna dados fundamentalistas
+        
+        Args:
+            derive_ratios: Se False, não calcula EV/EBITDA e PSR ausentes
+                (para quem completa vários tickers de uma vez, ex: StockScreener)
+        """
+        info = self.info
+        return self._fundamentals_from(info, self._price_from(info), derive_ratios)
+    
+    def get_snapshot(self, derive_ratios: bool = True) -> dict:
+        """
+        Retorna informações básicas e fundamentos num único dict
+        
+        Lê o info e o preço uma só vez; útil em loops sobre muitos tickers.
+        
+        Args:
+            derive_ratios: Repassado a get_fundamentals
+        """
+        info = self.info
+        price = self._price_from(info)
+        return {**self._basic_from(info, price), **self._fundamentals_from(info, price, derive_ratios)}
+    
+    def _basic_from(self, info: dict, price: float) -> dict:
+        """Monta as informações básicas a partir do info"""
         return {
             'ticker': self.ticker.replace('.SA', ''),
             'nome': info.get('shortName', 'N/A'),
             'setor': info.get('sector', 'N/A'),
             'industria': info.get('industry', 'N/A'),
-            'preco_atual': self.get_current_price(),
+            'preco_atual': price,
             'moeda': info.get('currency', 'BRL'),
             'market_cap': info.get('marketCap', 0),
             'volume_medio': info.get('averageVolume', 0),
         }
     
-    def get_fundamentals(self) -> dict:
-        """Retorna dados fundamentalistas"""
-        info = self.info
-        
+    @staticmethod
+    def _fundamentals_from(info: dict, price: float, derive_ratios: bool = True) -> dict:
+        """Monta os dados fundamentalistas a partir do info"""
         # EV/EBITDA - tenta pegar direto, senão calcula
         ev_ebitda = info.get('enterpriseToEbitda')
-        if not ev_ebitda:
+        if not ev_ebitda and derive_ratios:
             ev = info.get('enterpriseValue')
             ebitda = info.get('ebitda')
             if ev and ebitda and ebitda != 0:
@@ -102,14 +190,14 @@ class StockFetcher:
         
         # PSR (Price to Sales) - tenta pegar direto, senão calcula
         psr = info.get('priceToSalesTrailing12Months')
-        if not psr:
+        if not psr and derive_ratios:
             market_cap = info.get('marketCap')
             revenue = info.get('totalRevenue')
             if market_cap and revenue and revenue != 0:
                 psr = market_cap / revenue
         
         return {
-            'preco': self.get_current_price(),
+            'preco': price,
             'lpa': info.get('trailingEps', 0),  # Lucro por ação
             'vpa': info.get('bookValue', 0),     # Valor patrimonial por ação
             'pl': info.get('trailingPE', 0),     # P/L
@@ -131,17 +219,47 @@ class StockFetcher:
         }
 
 
-def fetch_multiple_stocks(tickers: list) -> dict:
+def fetch_multiple_stocks(tickers: list, period: str = None) -> dict:
     """
     Busca dados de múltiplas ações
     
+    Os yf.Ticker vêm de um único yf.Tickers (sessão HTTP compartilhada) e,
+    se period for informado, o histórico de todas as ações é baixado numa
+    só chamada a yf.download.
+    
     Args:
         tickers: Lista de tickers
+        period: Período do histórico a pré-carregar (opcional)
     
     Returns:
         Dicionário com StockFetcher para cada ticker
     """
-    return {ticker: StockFetcher(ticker) for ticker in tickers}
+    # yf.Tickers indexa os símbolos em maiúsculas
+    symbols = {ticker: (ticker if ticker.endswith('.SA') else f"{ticker}.SA").upper() for ticker in tickers}
+    if not symbols:
+        return {}
+    
+    batch = yf.Tickers(" ".join(symbols.values()))
+    fetchers = {ticker: StockFetcher(symbol, stock=batch.tickers[symbol])
+                for ticker, symbol in symbols.items()}
+    
+    if period:
+        data = yf.download(list(symbols.values()), period=period, group_by='ticker',
+                           auto_adjust=True, ignore_tz=False, threads=True, progress=False)
+        for ticker, symbol in symbols.items():
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                history = data[symbol]
+            else:
+                history = data
+            history = history.dropna(how='all')
+            if history.empty:
+                continue  # Sem dados no lote: get_history busca individualmente
+            fetchers[ticker]._history = history
+            fetchers[ticker]._history_key = (period, "1d")
+    
+    return fetchers
 
 
 if __name__ == "__main__":
@@ -2,10 +2,17 @@
 Módulo para buscar dados macroeconômicos do Banco Central do Brasil
 """
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional, Dict
 
+try:
+    import orjson  # Decodificação de JSON mais rápida, se instalado
+except ImportError:
+    orjson = None
+
 
 class MacroData:
     """Classe para buscar indicadores macroeconômicos do BCB"""
@@ -27,14 +34,17 @@ class MacroData:
     
     def __init__(self):
         self._cache: Dict[str, dict] = {}
+        # Sessão compartilhada: reaproveita conexões (keep-alive) entre as séries
+        self._session = requests.Session()
+        self._session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
     
     def _fetch_serie(self, codigo: int, n: int = 1) -> Optional[list]:
         """Busca série do BCB"""
         try:
             url = self.BCB_API_URL.format(codigo=codigo, n=n)
-            response = requests.get(url, timeout=10)
+            response = self._session.get(url, timeout=10)
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content) if orjson else response.json()
         except Exception as e:
             print(f"Erro ao buscar série {codigo}: {e}")
             return None
@@ -55,8 +65,12 @@ class MacroData:
     
     def get_cdi(self) -> Optional[float]:
         """Retorna CDI anualizado aproximado (usa SELIC como proxy)"""
+        return self._cdi_from_selic(self.get_selic())
+    
+    @staticmethod
+    def _cdi_from_selic(selic: Optional[float]) -> Optional[float]:
+        """Aproxima o CDI a partir de uma SELIC já buscada"""
         # CDI ≈ SELIC - 0.10
-        selic = self.get_selic()
         if selic:
             return selic - 0.10
         return None
@@ -69,14 +83,20 @@ class MacroData:
         return None
     
     def get_all_indicators(self) -> dict:
-        """Retorna todos os indicadores principais"""
-        return {
-            'selic': self.get_selic(),
-            'ipca_12m': self.get_ipca_12m(),
-            'cdi': self.get_cdi(),
-            'cambio': self.get_cambio(),
-            'data_consulta': datetime.now().strftime('%d/%m/%Y %H:%M')
+        """Retorna todos os indicadores principais (séries buscadas em paralelo)"""
+        getters = {
+            'selic': self.get_selic,
+            'ipca_12m': self.get_ipca_12m,
+            'cambio': self.get_cambio,
         }
+        with ThreadPoolExecutor(max_workers=len(getters)) as executor:
+            futures = {nome: executor.submit(getter) for nome, getter in getters.items()}
+            indicators = {nome: future.result() for nome, future in futures.items()}
+        
+        # Deriva o CDI da SELIC já buscada em vez de buscá-la de novo
+        indicators['cdi'] = self._cdi_from_selic(indicators['selic'])
+        indicators['data_consulta'] = datetime.now().strftime('%d/%m/%Y %H:%M')
+        return indicators
     
     def get_historical_selic(self, months: int = 12) -> pd.DataFrame:
         """Retorna histórico da SELIC"""
@@ -109,6 +129,9 @@ SECTOR_BENCHMARKS = {
 # Fallback para setores não mapeados
 DEFAULT_BENCHMARK = {'pl_medio': 12, 'pvp_medio': 2.0, 'dy_medio': 0.04}
 
+# Chaves em minúsculas, calculadas uma vez para o match parcial
+_SECTOR_BENCHMARKS_LOWER = {key.lower(): value for key, value in SECTOR_BENCHMARKS.items()}
+
 
 def get_sector_benchmark(sector: str) -> dict:
     """Retorna benchmark do setor"""
@@ -118,8 +141,8 @@ def get_sector_benchmark(sector: str) -> dict:
     
     # Tenta match parcial
     sector_lower = sector.lower()
-    for key, value in SECTOR_BENCHMARKS.items():
-        if key.lower() in sector_lower or sector_lower in key.lower():
+    for key_lower, value in _SECTOR_BENCHMARKS_LOWER.items():
+        if key_lower in sector_lower or sector_lower in key_lower:
             return value
     
     # Fallback
@@ -10,34 +10,111 @@ GitHub: https://github.com/Lzocatelli
 import sys
 import os
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tabulate import tabulate
+import numpy as np
+import pandas as pd
 
 # Adiciona o diretório raiz ao path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from data.fetcher import StockFetcher, fetch_multiple_stocks
-from analysis.indicators import StockAnalyzer, compare_stocks
+from analysis.indicators import StockAnalyzer, compare_stocks, batch_summary_stats
 from analysis.screener import StockScreener
 from visualization.charts import StockCharts, plot_comparison, plot_fundamentals_comparison
 import matplotlib.pyplot as plt
 
 
-def format_number(value, is_percent=False, is_currency=False, is_large=False):
-    """Formata números para exibição"""
+def _fmt_pct(value) -> str:
+    """Formata percentual"""
+    if value is None or value == 0:
+        return "N/A"
+    return f"{value * 100:.2f}%"
+
+
+def _fmt_currency(value) -> str:
+    """Formata valor em reais"""
+    if value is None or value == 0:
+        return "N/A"
+    return f"R$ {value:,.2f}"
+
+
+def _fmt_large(value) -> str:
+    """Formata valores grandes (T/B/M)"""
     if value is None or value == 0:
         return "N/A"
+    if abs(value) >= 1e12:
+        return f"R$ {value/1e12:.2f}T"
+    elif abs(value) >= 1e9:
+        return f"R$ {value/1e9:.2f}B"
+    elif abs(value) >= 1e6:
+        return f"R$ {value/1e6:.2f}M"
+    return f"{value:.2f}"
+
+
+def _fmt_plain(value) -> str:
+    """Formata número com duas casas"""
+    if value is None or value == 0:
+        return "N/A"
+    return f"{value:.2f}"
+
+
+def format_number(value, is_percent=False, is_currency=False, is_large=False):
+    """Formata números para exibição (use os _fmt_* diretamente quando o tipo é fixo)"""
     if is_percent:
-        return f"{value * 100:.2f}%"
+        return _fmt_pct(value)
     if is_currency:
-        return f"R$ {value:,.2f}"
+        return _fmt_currency(value)
     if is_large:
-        if abs(value) >= 1e12:
-            return f"R$ {value/1e12:.2f}T"
-        elif abs(value) >= 1e9:
-            return f"R$ {value/1e9:.2f}B"
-        elif abs(value) >= 1e6:
-            return f"R$ {value/1e6:.2f}M"
-    return f"{value:.2f}"
+        return _fmt_large(value)
+    return _fmt_plain(value)
+
+
+# Regras da interpretação automática: (origem, chave, condição, mensagem), avaliadas em ordem
+INTERPRETATION_RULES = (
+    # P/L
+    ('fund', 'pl', lambda v: v and 0 < v < 10, "✅ P/L baixo (<10): Ação pode estar barata"),
+    ('fund', 'pl', lambda v: v and v > 25, "⚠️  P/L alto (>25): Ação pode estar cara ou mercado espera crescimento"),
+    ('fund', 'pl', lambda v: v and 10 <= v <= 25, "➖ P/L em faixa neutra (10-25)"),
+    # ROE
+    ('fund', 'roe', lambda v: v and v > 0.15, "✅ ROE alto (>15%): Boa rentabilidade sobre patrimônio"),
+    ('fund', 'roe', lambda v: v and v < 0.08, "⚠️  ROE baixo (<8%): Baixa rentabilidade"),
+    # Dividend Yield
+    ('fund', 'dividend_yield', lambda v: v and v > 0.06, "✅ DY alto (>6%): Boa pagadora de dividendos"),
+    # Performance
+    ('stats', 'retorno_total', lambda v: v > 0.20, "✅ Retorno forte (>20%) nos últimos 12 meses"),
+    ('stats', 'retorno_total', lambda v: v < -0.20, "⚠️  Queda significativa (>20%) nos últimos 12 meses"),
+    ('stats', 'sharpe_ratio', lambda v: v > 1, "✅ Sharpe Ratio > 1: Bom retorno ajustado ao risco"),
+    ('stats', 'sharpe_ratio', lambda v: v < 0, "⚠️  Sharpe Ratio negativo: Retorno abaixo do CDI"),
+)
+
+
+def _fmt_pct_col(values: pd.Series) -> pd.Series:
+    """Formata uma coluna inteira como percentual (vazios e zeros viram N/A)"""
+    arr = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+    out = np.full(arr.shape, "N/A", dtype=object)
+    valid = ~np.isnan(arr) & (arr != 0)
+    out[valid] = [f"{v:.2f}%" for v in arr[valid] * 100.0]
+    return pd.Series(out, index=values.index)
+
+
+def _render_two_col(rows: list) -> str:
+    """Renderiza tabela de duas colunas (indicador, valor) no estilo 'simple', sem tabulate"""
+    w1 = max(len(label) for label, _ in rows)
+    w2 = max(len(str(value)) for _, value in rows)
+    rule = f"{'-' * w1}  {'-' * w2}"
+    return "\n".join([rule, *(f"{label:<{w1}}  {value}" for label, value in rows), rule])
+
+
+def _interactive() -> bool:
+    """True quando há um terminal para exibir as figuras com plt.show()"""
+    return sys.stdout.isatty()
+
+
+def _release_figure(fig):
+    """Fecha a figura já salva quando ela não vai ser exibida (libera a memória)"""
+    if not _interactive():
+        plt.close(fig)
 
 
 def print_header(text: str):
@@ -69,27 +146,27 @@ def analyze_single_stock(ticker: str, save_charts: bool = False):
         ["Nome", basic['nome']],
         ["Setor", basic['setor']],
         ["Indústria", basic['industria']],
-        ["Preço Atual", format_number(basic['preco_atual'], is_currency=True)],
-        ["Market Cap", format_number(basic['market_cap'], is_large=True)],
+        ["Preço Atual", _fmt_currency(basic['preco_atual'])],
+        ["Market Cap", _fmt_large(basic['market_cap'])],
         ["Volume Médio", f"{basic['volume_medio']:,.0f}"],
     ]
-    print(tabulate(basic_table, tablefmt="simple"))
+    print(_render_two_col(basic_table))
     
     # Múltiplos Fundamentalistas
     print_header("MÚLTIPLOS FUNDAMENTALISTAS")
     fund = stock.get_fundamentals()
     fund_table = [
-        ["P/L (Preço/Lucro)", format_number(fund['pl'])],
-        ["P/VP (Preço/Valor Patrimonial)", format_number(fund['pvp'])],
-        ["LPA (Lucro por Ação)", format_number(fund['lpa'], is_currency=True)],
-        ["VPA (Valor Patrimonial por Ação)", format_number(fund['vpa'], is_currency=True)],
-        ["Dividend Yield", format_number(fund['dividend_yield'], is_percent=True)],
-        ["Payout Ratio", format_number(fund['payout_ratio'], is_percent=True)],
-        ["ROE", format_number(fund['roe'], is_percent=True)],
-        ["Margem Líquida", format_number(fund['margem_liquida'], is_percent=True)],
-        ["Dívida/Patrimônio", format_number(fund['divida_patrimonio'])],
+        ["P/L (Preço/Lucro)", _fmt_plain(fund['pl'])],
+        ["P/VP (Preço/Valor Patrimonial)", _fmt_plain(fund['pvp'])],
+        ["LPA (Lucro por Ação)", _fmt_currency(fund['lpa'])],
+        ["VPA (Valor Patrimonial por Ação)", _fmt_currency(fund['vpa'])],
+        ["Dividend Yield", _fmt_pct(fund['dividend_yield'])],
+        ["Payout Ratio", _fmt_pct(fund['payout_ratio'])],
+        ["ROE", _fmt_pct(fund['roe'])],
+        ["Margem Líquida", _fmt_pct(fund['margem_liquida'])],
+        ["Dívida/Patrimônio", _fmt_plain(fund['divida_patrimonio'])],
     ]
-    print(tabulate(fund_table, tablefmt="simple"))
+    print(_render_two_col(fund_table))
     
     # Análise de Performance
     print_header("ANÁLISE DE PERFORMANCE (12 MESES)")
@@ -98,58 +175,28 @@ def analyze_single_stock(ticker: str, save_charts: bool = False):
     stats = analyzer.get_summary_stats(period=252)
     
     perf_table = [
-        ["Retorno Total (12m)", format_number(stats['retorno_total'], is_percent=True)],
-        ["Retorno Anualizado", format_number(stats['retorno_anualizado'], is_percent=True)],
-        ["Volatilidade Anual", format_number(stats['volatilidade_anual'], is_percent=True)],
-        ["Sharpe Ratio", format_number(stats['sharpe_ratio'])],
-        ["Máximo Drawdown", format_number(stats['max_drawdown'], is_percent=True)],
-        ["Máxima 52 semanas", format_number(stats['preco_max_52w'], is_currency=True)],
-        ["Mínima 52 semanas", format_number(stats['preco_min_52w'], is_currency=True)],
+        ["Retorno Total (12m)", _fmt_pct(stats['retorno_total'])],
+        ["Retorno Anualizado", _fmt_pct(stats['retorno_anualizado'])],
+        ["Volatilidade Anual", _fmt_pct(stats['volatilidade_anual'])],
+        ["Sharpe Ratio", _fmt_plain(stats['sharpe_ratio'])],
+        ["Máximo Drawdown", _fmt_pct(stats['max_drawdown'])],
+        ["Máxima 52 semanas", _fmt_currency(stats['preco_max_52w'])],
+        ["Mínima 52 semanas", _fmt_currency(stats['preco_min_52w'])],
     ]
-    print(tabulate(perf_table, tablefmt="simple"))
+    print(_render_two_col(perf_table))
     
     # Interpretação automática
     print_header("INTERPRETAÇÃO")
-    interpretations = []
-    
-    # P/L
-    if fund['pl'] and fund['pl'] > 0:
-        if fund['pl'] < 10:
-            interpretations.append("✅ P/L baixo (<10): Ação pode estar barata")
-        elif fund['pl'] > 25:
-            interpretations.append("⚠️  P/L alto (>25): Ação pode estar cara ou mercado espera crescimento")
-        else:
-            interpretations.append("➖ P/L em faixa neutra (10-25)")
-    
-    # ROE
-    if fund['roe']:
-        if fund['roe'] > 0.15:
-            interpretations.append("✅ ROE alto (>15%): Boa rentabilidade sobre patrimônio")
-        elif fund['roe'] < 0.08:
-            interpretations.append("⚠️  ROE baixo (<8%): Baixa rentabilidade")
-    
-    # Dividend Yield
-    if fund['dividend_yield']:
-        if fund['dividend_yield'] > 0.06:
-            interpretations.append("✅ DY alto (>6%): Boa pagadora de dividendos")
-    
-    # Performance
-    if stats['retorno_total'] > 0.20:
-        interpretations.append("✅ Retorno forte (>20%) nos últimos 12 meses")
-    elif stats['retorno_total'] < -0.20:
-        interpretations.append("⚠️  Queda significativa (>20%) nos últimos 12 meses")
-    
-    if stats['sharpe_ratio'] > 1:
-        interpretations.append("✅ Sharpe Ratio > 1: Bom retorno ajustado ao risco")
-    elif stats['sharpe_ratio'] < 0:
-        interpretations.append("⚠️  Sharpe Ratio negativo: Retorno abaixo do CDI")
+    sources = {'fund': fund, 'stats': stats}
+    interpretations = [msg for source, key, cond, msg in INTERPRETATION_RULES
+                       if cond(sources[source].get(key))]
     
     for interp in interpretations:
         print(f"  {interp}")
     
     # Gráficos
     print("\n📈 Gerando gráficos...")
-    charts = StockCharts(history, ticker)
+    charts = StockCharts(history, ticker, returns=analyzer.returns)
     
     output_dir = os.path.join(os.path.dirname(__file__), 'reports')
     os.makedirs(output_dir, exist_ok=True)
@@ -158,23 +205,33 @@ def analyze_single_stock(ticker: str, save_charts: bool = False):
     fig1 = charts.plot_price(show_ma=[20, 50, 200])
     if save_charts:
         fig1.savefig(os.path.join(output_dir, f'{ticker}_price.png'), dpi=150, bbox_inches='tight')
+        _release_figure(fig1)
         print(f"  Salvo: reports/{ticker}_price.png")
     
     # Gráfico de retornos
     fig2 = charts.plot_returns()
     if save_charts:
         fig2.savefig(os.path.join(output_dir, f'{ticker}_returns.png'), dpi=150, bbox_inches='tight')
+        _release_figure(fig2)
         print(f"  Salvo: reports/{ticker}_returns.png")
     
     # Gráfico de drawdown
     fig3 = charts.plot_drawdown()
     if save_charts:
         fig3.savefig(os.path.join(output_dir, f'{ticker}_drawdown.png'), dpi=150, bbox_inches='tight')
+        _release_figure(fig3)
         print(f"  Salvo: reports/{ticker}_drawdown.png")
     
     return stock, analyzer, charts
 
 
+def _load_one(stock: StockFetcher, period: str = "1y"):
+    """Busca os fundamentos e o histórico de uma ação (executado em paralelo)"""
+    fund = stock.get_fundamentals()
+    history = stock.get_history(period=period)
+    return stock, fund, history, StockAnalyzer(history)
+
+
 def compare_multiple_stocks(tickers: list, save_charts: bool = False):
     """
     Compara múltiplas ações
@@ -187,32 +244,44 @@ def compare_multiple_stocks(tickers: list, save_charts: bool = False):
     
     print("\n📊 Buscando dados...")
     stocks = {}
+    fundamentals = {}
     histories = {}
     analyzers = {}
     
+    # Históricos de todas as ações numa única chamada a yf.download
+    try:
+        fetchers = fetch_multiple_stocks(tickers, period="1y")
+    except Exception as e:
+        print(f"  Download em lote falhou ({e}); buscando ação por ação")
+        fetchers = fetch_multiple_stocks(tickers)
+    
+    # Fundamentos em paralelo (I/O); imprime cada ticker conforme termina
+    loaded = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(tickers)))) as executor:
+        futures = {executor.submit(_load_one, fetchers[ticker]): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                loaded[ticker] = future.result()
+                print(f"  {ticker}... OK")
+            except Exception as e:
+                print(f"  {ticker}... ERRO: {e}")
+    
+    # Mantém a ordem dos tickers informada
     for ticker in tickers:
-        print(f"  {ticker}...", end=" ")
-        try:
-            stock = StockFetcher(ticker)
-            history = stock.get_history(period="1y")
-            stocks[ticker] = stock
-            histories[ticker] = history
-            analyzers[ticker] = StockAnalyzer(history)
-            print("OK")
-        except Exception as e:
-            print(f"ERRO: {e}")
+        if ticker in loaded:
+            stocks[ticker], fundamentals[ticker], histories[ticker], analyzers[ticker] = loaded[ticker]
     
     # Tabela comparativa de fundamentos
     print_header("COMPARAÇÃO DE MÚLTIPLOS")
     data = []
-    for ticker, stock in stocks.items():
-        fund = stock.get_fundamentals()
+    for ticker, fund in fundamentals.items():
         data.append({
             'Ticker': ticker,
-            'P/L': format_number(fund['pl']),
-            'P/VP': format_number(fund['pvp']),
-            'DY': format_number(fund['dividend_yield'], is_percent=True),
-            'ROE': format_number(fund['roe'], is_percent=True),
+            'P/L': _fmt_plain(fund['pl']),
+            'P/VP': _fmt_plain(fund['pvp']),
+            'DY': _fmt_pct(fund['dividend_yield']),
+            'ROE': _fmt_pct(fund['roe']),
         })
     
     print(tabulate(data, headers='keys', tablefmt='simple'))
@@ -220,14 +289,14 @@ def compare_multiple_stocks(tickers: list, save_charts: bool = False):
     # Tabela comparativa de performance
     print_header("COMPARAÇÃO DE PERFORMANCE")
     perf_data = []
-    for ticker, analyzer in analyzers.items():
-        stats = analyzer.get_summary_stats()
+    summary = batch_summary_stats(histories)
+    for ticker, stats in summary.iterrows():
         perf_data.append({
             'Ticker': ticker,
-            'Retorno 12m': format_number(stats['retorno_total'], is_percent=True),
-            'Volatilidade': format_number(stats['volatilidade_anual'], is_percent=True),
-            'Sharpe': format_number(stats['sharpe_ratio']),
-            'Max DD': format_number(stats['max_drawdown'], is_percent=True),
+            'Retorno 12m': _fmt_pct(stats['retorno_total']),
+            'Volatilidade': _fmt_pct(stats['volatilidade_anual']),
+            'Sharpe': _fmt_plain(stats['sharpe_ratio']),
+            'Max DD': _fmt_pct(stats['max_drawdown']),
         })
     
     print(tabulate(perf_data, headers='keys', tablefmt='simple'))
@@ -241,6 +310,7 @@ def compare_multiple_stocks(tickers: list, save_charts: bool = False):
         os.makedirs(output_dir, exist_ok=True)
         filename = '_'.join(tickers) + '_comparison.png'
         fig.savefig(os.path.join(output_dir, filename), dpi=150, bbox_inches='tight')
+        _release_figure(fig)
         print(f"  Salvo: reports/{filename}")
     
     return stocks, analyzers
@@ -279,8 +349,8 @@ def run_screener(criteria: dict = None):
     dividends = screener.dividend_stocks(top_n=5)
     if not dividends.empty:
         div_display = dividends[['ticker', 'nome', 'dividend_yield', 'payout_ratio']].copy()
-        div_display['dividend_yield'] = div_display['dividend_yield'].apply(lambda x: f"{x*100:.2f}%")
-        div_display['payout_ratio'] = div_display['payout_ratio'].apply(lambda x: f"{x*100:.2f}%" if x else "N/A")
+        div_display['dividend_yield'] = _fmt_pct_col(div_display['dividend_yield'])
+        div_display['payout_ratio'] = _fmt_pct_col(div_display['payout_ratio'])
         print(tabulate(
             div_display,
             headers=['Ticker', 'Nome', 'DY', 'Payout'],
@@ -293,8 +363,8 @@ def run_screener(criteria: dict = None):
     quality = screener.quality_stocks(top_n=5)
     if not quality.empty:
         qual_display = quality[['ticker', 'nome', 'roe', 'margem_liquida']].copy()
-        qual_display['roe'] = qual_display['roe'].apply(lambda x: f"{x*100:.2f}%")
-        qual_display['margem_liquida'] = qual_display['margem_liquida'].apply(lambda x: f"{x*100:.2f}%" if x else "N/A")
+        qual_display['roe'] = _fmt_pct_col(qual_display['roe'])
+        qual_display['margem_liquida'] = _fmt_pct_col(qual_display['margem_liquida'])
         print(tabulate(
             qual_display,
             headers=['Ticker', 'Nome', 'ROE', 'Margem Líq'],
@@ -329,13 +399,15 @@ def main():
     if choice == "1":
         ticker = input("Digite o ticker (ex: ITUB4): ").strip().upper()
         analyze_single_stock(ticker, save_charts=True)
-        plt.show()
+        if _interactive():
+            plt.show()
         
     elif choice == "2":
         tickers_input = input("Digite os tickers separados por vírgula (ex: ITUB4,BBDC4,SANB11): ")
         tickers = [t.strip().upper() for t in tickers_input.split(',')]
         compare_multiple_stocks(tickers, save_charts=True)
-        plt.show()
+        if _interactive():
+            plt.show()
         
     elif choice == "3":
         run_screener()
@@ -348,7 +420,8 @@ def main():
         print("  Comparando ITUB4 com peers do setor bancário...")
         print("=" * 60)
         compare_multiple_stocks(['ITUB4', 'BBDC4', 'BBAS3', 'SANB11'], save_charts=True)
-        plt.show()
+        if _interactive():
+            plt.show()
         
     elif choice == "5":
         print("\nAté mais! 👋")
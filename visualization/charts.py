@@ -5,16 +5,66 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from typing import Optional, List, Dict
+from typing import Optional, Dict, Sequence, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
-# Configuração de estilo
-plt.style.use('seaborn-v0_8-whitegrid')
-plt.rcParams['figure.figsize'] = (12, 6)
-plt.rcParams['font.size'] = 10
-plt.rcParams['axes.titlesize'] = 14
-plt.rcParams['axes.labelsize'] = 12
+# Configuração de estilo, aplicada só no primeiro gráfico (importar o módulo sem desenhar,
+# como no screener, não paga o custo do plt.style.use)
+_STYLE_APPLIED = False
+
+
+def _ensure_style():
+    """Aplica o estilo padrão do matplotlib na primeira chamada"""
+    global _STYLE_APPLIED
+    if not _STYLE_APPLIED:
+        plt.style.use('seaborn-v0_8-whitegrid')
+        plt.rcParams.update({
+            'figure.figsize': (12, 6),
+            'font.size': 10,
+            'axes.titlesize': 14,
+            'axes.labelsize': 12,
+        })
+        _STYLE_APPLIED = True
+
+
+# Formato mês/ano do eixo x, compartilhado por todos os gráficos (o DateFormatter não guarda estado
+# por eixo; já o MonthLocator precisa de uma instância nova por eixo)
+_MONTH_FMT = mdates.DateFormatter('%b/%y')
+
+
+def _rolling_means(close: np.ndarray, periods) -> np.ndarray:
+    """
+    Médias móveis simples de vários períodos a partir de uma única soma acumulada
+    
+    Equivale a Series.rolling(p).mean() para cada p (janela com NaN vira NaN).
+    
+    Returns:
+        Array (len(periods), len(close)), uma linha por período
+    """
+    valid = ~np.isnan(close)
+    csum = np.concatenate(([0.0], np.cumsum(np.where(valid, close, 0.0))))
+    ccount = np.concatenate(([0], np.cumsum(valid)))
+    
+    out = np.full((len(periods), close.size), np.nan)
+    for j, p in enumerate(periods):
+        if p > close.size:
+            continue
+        sums = csum[p:] - csum[:-p]
+        counts = ccount[p:] - ccount[:-p]
+        out[j, p - 1:] = np.where(counts == p, sums / p, np.nan)
+    return out
+
+
+def _subplots(fig: Optional[plt.Figure], nrows: int = 1, ncols: int = 1,
+              figsize: tuple = (12, 6), **kwargs):
+    """Cria os eixos numa figura nova ou limpa e reaproveita a figura recebida"""
+    if fig is None:
+        fig = plt.figure(figsize=figsize)
+    else:
+        fig.clear()
+        fig.set_size_inches(*figsize)
+    return fig, fig.subplots(nrows, ncols, **kwargs)
 
 
 class StockCharts:
@@ -31,42 +81,49 @@ class StockCharts:
         'ma_200': '#9b59b6',
     }
     
-    def __init__(self, history: pd.DataFrame, ticker: str = ""):
+    def __init__(self, history: pd.DataFrame, ticker: str = "",
+                 returns: Optional[pd.Series] = None):
         """
         Inicializa com histórico de preços
         
         Args:
             history: DataFrame com OHLCV
             ticker: Nome do ticker para títulos
+            returns: Retornos diários já calculados (ex.: StockAnalyzer.returns);
+                     None = calcula a partir do fechamento
         """
-        self.history = history.copy()
+        self.history = history  # Os gráficos só leem o histórico; não precisa de cópia
         self.ticker = ticker
+        self.returns = returns
     
     def plot_price(self, 
                    show_volume: bool = True,
-                   show_ma: List[int] = [20, 50],
-                   save_path: Optional[str] = None) -> plt.Figure:
+                   show_ma: Sequence[int] = (20, 50),
+                   save_path: Optional[str] = None,
+                   fig: Optional[plt.Figure] = None) -> plt.Figure:
         """
         Gráfico de preço com volume
         
         Args:
             show_volume: Mostrar volume no subplot inferior
-            show_ma: Lista de períodos de médias móveis
+            show_ma: Períodos das médias móveis
             save_path: Caminho para salvar (None = não salva)
+            fig: Figura a reaproveitar (None = cria uma nova)
         """
+        _ensure_style()
         if show_volume:
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), 
-                                            gridspec_kw={'height_ratios': [3, 1]})
+            fig, (ax1, ax2) = _subplots(fig, 2, 1, figsize=(12, 8), 
+                                        gridspec_kw={'height_ratios': [3, 1]})
         else:
-            fig, ax1 = plt.subplots(1, 1, figsize=(12, 6))
+            fig, ax1 = _subplots(fig, 1, 1, figsize=(12, 6))
         
         # Preço
         ax1.plot(self.history.index, self.history['Close'], 
                  color=self.COLORS['primary'], linewidth=1.5, label='Preço')
         
-        # Médias móveis
-        for period in show_ma:
-            ma = self.history['Close'].rolling(period).mean()
+        # Médias móveis (todas a partir de uma única soma acumulada)
+        mas = _rolling_means(self.history['Close'].to_numpy(dtype=float), show_ma)
+        for period, ma in zip(show_ma, mas):
             color = self.COLORS.get(f'ma_{period}', self.COLORS['secondary'])
             ax1.plot(self.history.index, ma, 
                      color=color, linewidth=1, linestyle='--', 
@@ -75,54 +132,66 @@ class StockCharts:
         ax1.set_title(f'{self.ticker} - Histórico de Preços', fontweight='bold')
         ax1.set_ylabel('Preço (R$)')
         ax1.legend(loc='upper left')
-        ax1.xaxis.set_major_formatter(mdates.DateFormatter('%b/%y'))
+        ax1.xaxis.set_major_formatter(_MONTH_FMT)
         ax1.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
         
         # Volume
         if show_volume:
-            colors = [self.COLORS['positive'] if c >= o else self.COLORS['negative'] 
-                      for c, o in zip(self.history['Close'], self.history['Open'])]
-            ax2.bar(self.history.index, self.history['Volume'], color=colors, alpha=0.7)
+            up = self.history['Close'].to_numpy() >= self.history['Open'].to_numpy()
+            colors = np.where(up, self.COLORS['positive'], self.COLORS['negative'])
+            ax2.bar(self.history.index, self.history['Volume'], color=colors, alpha=0.7,
+                    rasterized=True)  # Centenas de barras: vira bitmap no arquivo salvo
             ax2.set_ylabel('Volume')
-            ax2.xaxis.set_major_formatter(mdates.DateFormatter('%b/%y'))
+            ax2.xaxis.set_major_formatter(_MONTH_FMT)
             ax2.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
             ax2.yaxis.set_major_formatter(lambda x, p: f'{x/1e6:.1f}M')
         
-        plt.tight_layout()
+        fig.tight_layout()
         
         if save_path:
-            plt.savefig(save_path, dpi=150, bbox_inches='tight')
+            fig.savefig(save_path, dpi=150, bbox_inches='tight')
         
         return fig
     
-    def plot_returns(self, period: int = 252, save_path: Optional[str] = None) -> plt.Figure:
+    def plot_returns(self, period: int = 252, save_path: Optional[str] = None,
+                     fig: Optional[plt.Figure] = None) -> plt.Figure:
         """
         Gráfico de retornos acumulados
         
         Args:
             period: Período em dias
             save_path: Caminho para salvar
+            fig: Figura a reaproveitar (None = cria uma nova)
         """
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+        _ensure_style()
+        fig, (ax1, ax2) = _subplots(fig, 1, 2, figsize=(14, 5))
         
-        data = self.history.tail(period).copy()
-        returns = data['Close'].pct_change()
+        data = self.history.tail(period)
+        if self.returns is not None:
+            # O primeiro retorno da janela vem do dia anterior a ela; zera-o como faria
+            # o pct_change sobre a própria janela
+            returns = self.returns.tail(period).copy()
+            returns.iloc[:1] = np.nan
+        else:
+            returns = data['Close'].pct_change()
         cum_returns = (1 + returns).cumprod() - 1
         
         # Retorno acumulado
         ax1.fill_between(data.index, cum_returns * 100, 
-                         where=cum_returns >= 0, color=self.COLORS['positive'], alpha=0.5)
+                         where=cum_returns >= 0, color=self.COLORS['positive'], alpha=0.5,
+                         rasterized=True)
         ax1.fill_between(data.index, cum_returns * 100, 
-                         where=cum_returns < 0, color=self.COLORS['negative'], alpha=0.5)
+                         where=cum_returns < 0, color=self.COLORS['negative'], alpha=0.5,
+                         rasterized=True)
         ax1.plot(data.index, cum_returns * 100, color=self.COLORS['primary'], linewidth=1.5)
         ax1.axhline(y=0, color='black', linestyle='-', linewidth=0.5)
         ax1.set_title(f'{self.ticker} - Retorno Acumulado', fontweight='bold')
         ax1.set_ylabel('Retorno (%)')
-        ax1.xaxis.set_major_formatter(mdates.DateFormatter('%b/%y'))
+        ax1.xaxis.set_major_formatter(_MONTH_FMT)
         
         # Distribuição de retornos
         ax2.hist(returns.dropna() * 100, bins=50, color=self.COLORS['primary'], 
-                 alpha=0.7, edgecolor='white')
+                 alpha=0.7, edgecolor='white', rasterized=True)
         ax2.axvline(x=returns.mean() * 100, color=self.COLORS['negative'], 
                     linestyle='--', label=f'Média: {returns.mean()*100:.2f}%')
         ax2.set_title(f'{self.ticker} - Distribuição de Retornos Diários', fontweight='bold')
@@ -130,34 +199,40 @@ class StockCharts:
         ax2.set_ylabel('Frequência')
         ax2.legend()
         
-        plt.tight_layout()
+        fig.tight_layout()
         
         if save_path:
-            plt.savefig(save_path, dpi=150, bbox_inches='tight')
+            fig.savefig(save_path, dpi=150, bbox_inches='tight')
         
         return fig
     
-    def plot_drawdown(self, period: int = 252, save_path: Optional[str] = None) -> plt.Figure:
+    def plot_drawdown(self, period: int = 252, save_path: Optional[str] = None,
+                      fig: Optional[plt.Figure] = None) -> plt.Figure:
         """
         Gráfico de drawdown
         
         Args:
             period: Período em dias
             save_path: Caminho para salvar
+            fig: Figura a reaproveitar (None = cria uma nova)
         """
-        fig, ax = plt.subplots(figsize=(12, 5))
+        _ensure_style()
+        fig, ax = _subplots(fig, figsize=(12, 5))
         
-        data = self.history.tail(period).copy()
-        cummax = data['Close'].cummax()
-        drawdown = (data['Close'] - cummax) / cummax * 100
+        data = self.history.tail(period)
+        close = data['Close'].to_numpy(dtype=float)
+        cummax = np.fmax.accumulate(close)
+        drawdown = (close - cummax) / cummax * 100.0
         
-        ax.fill_between(data.index, drawdown, color=self.COLORS['negative'], alpha=0.5)
+        ax.fill_between(data.index, drawdown, color=self.COLORS['negative'], alpha=0.5,
+                        rasterized=True)
         ax.plot(data.index, drawdown, color=self.COLORS['negative'], linewidth=1)
         ax.axhline(y=0, color='black', linestyle='-', linewidth=0.5)
         
         # Marca o máximo drawdown
-        min_dd = drawdown.min()
-        min_dd_date = drawdown.idxmin()
+        min_idx = np.nanargmin(drawdown)
+        min_dd = drawdown[min_idx]
+        min_dd_date = data.index[min_idx]
         ax.scatter([min_dd_date], [min_dd], color='red', s=100, zorder=5)
         ax.annotate(f'Max DD: {min_dd:.1f}%', xy=(min_dd_date, min_dd),
                     xytext=(10, -20), textcoords='offset points',
@@ -165,14 +240,19 @@ class StockCharts:
         
         ax.set_title(f'{self.ticker} - Drawdown', fontweight='bold')
         ax.set_ylabel('Drawdown (%)')
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%b/%y'))
+        ax.xaxis.set_major_formatter(_MONTH_FMT)
         
-        plt.tight_layout()
+        fig.tight_layout()
         
         if save_path:
-            plt.savefig(save_path, dpi=150, bbox_inches='tight')
+            fig.savefig(save_path, dpi=150, bbox_inches='tight')
         
         return fig
+    
+    @staticmethod
+    def close_all():
+        """Fecha todas as figuras abertas (libera memória em execuções em lote)"""
+        plt.close('all')
 
 
 def plot_comparison(histories: Dict[str, pd.DataFrame], 
@@ -186,13 +266,22 @@ def plot_comparison(histories: Dict[str, pd.DataFrame],
         normalize: Se True, normaliza para base 100
         save_path: Caminho para salvar
     """
+    _ensure_style()
     fig, ax = plt.subplots(figsize=(12, 6))
+    if not histories:
+        # Nenhuma ação carregada: não há o que concatenar, devolve a figura vazia
+        return fig
+    
+    # Alinha os fechamentos numa única matriz (datas x tickers)
+    closes = pd.concat({ticker: history['Close'] for ticker, history in histories.items()}, axis=1)
+    values = closes.to_numpy(dtype=float)
+    if normalize:
+        # Base 100 de todas as ações de uma vez, a partir do primeiro preço válido de cada uma
+        values = values / closes.bfill().iloc[0].to_numpy(dtype=float) * 100
     
-    for ticker, history in histories.items():
-        prices = history['Close']
-        if normalize:
-            prices = prices / prices.iloc[0] * 100
-        ax.plot(history.index, prices, linewidth=1.5, label=ticker)
+    for i, ticker in enumerate(closes.columns):
+        valid = ~np.isnan(values[:, i])
+        ax.plot(closes.index[valid], values[valid, i], linewidth=1.5, label=ticker)
     
     title = 'Comparação de Performance'
     if normalize:
@@ -200,7 +289,7 @@ def plot_comparison(histories: Dict[str, pd.DataFrame],
     ax.set_title(title, fontweight='bold')
     ax.set_ylabel('Preço' if not normalize else 'Base 100')
     ax.legend(loc='upper left')
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%b/%y'))
+    ax.xaxis.set_major_formatter(_MONTH_FMT)
     
     plt.tight_layout()
     
@@ -211,16 +300,17 @@ def plot_comparison(histories: Dict[str, pd.DataFrame],
 
 
 def plot_fundamentals_comparison(data: pd.DataFrame, 
-                                  metrics: List[str] = ['pl', 'pvp', 'roe', 'dividend_yield'],
+                                  metrics: Tuple[str, ...] = ('pl', 'pvp', 'roe', 'dividend_yield'),
                                   save_path: Optional[str] = None) -> plt.Figure:
     """
     Gráfico de barras comparando múltiplos fundamentalistas
     
     Args:
         data: DataFrame com métricas por ticker
-        metrics: Lista de métricas para plotar
+        metrics: Métricas para plotar
         save_path: Caminho para salvar
     """
+    _ensure_style()
     n_metrics = len(metrics)
     fig, axes = plt.subplots(2, 2, figsize=(12, 10))
     axes = axes.flatten()
@@ -248,13 +338,8 @@ def plot_fundamentals_comparison(data: pd.DataFrame,
         ax.set_title(labels_map.get(metric, metric), fontweight='bold')
         ax.tick_params(axis='x', rotation=45)
         
-        # Adiciona valores nas barras
-        for bar, val in zip(bars, values):
-            height = bar.get_height()
-            ax.annotate(f'{val:.1f}',
-                        xy=(bar.get_x() + bar.get_width() / 2, height),
-                        xytext=(0, 3), textcoords="offset points",
-                        ha='center', va='bottom', fontsize=8)
+        # Adiciona valores nas barras (um único bar_label posiciona todos os rótulos)
+        ax.bar_label(bars, fmt='{:.1f}', padding=3, fontsize=8)
     
     plt.suptitle('Comparação de Múltiplos Fundamentalistas', fontsize=14, fontweight='bold')
     plt.tight_layout()